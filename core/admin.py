@@ -1,25 +1,45 @@
 # core/admin.py
 
+import hashlib
+
 from django import forms
 import core.translation
 from django.contrib import admin
+from django.core.cache import cache
+from django.db.models import Count, Max
 from django.forms.models import BaseInlineFormSet
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.urls import path, reverse
+from django.utils.cache import patch_cache_control
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.db import models 
 from unfold.admin import ModelAdmin
 from modeltranslation.admin import TabbedTranslationAdmin
-from unfold.contrib.filters.admin import RelatedDropdownFilter
+from unfold.contrib.filters.admin import AutocompleteSelectFilter, RelatedDropdownFilter
 from adminsortable2.admin import SortableAdminMixin
 from django_ckeditor_5.widgets import CKEditor5Widget
 from colorfield.fields import ColorField
 from django.db import models
 from .models import (
     SiteSettings, Hero, RotatingTextItem, HeroBackgroundImage,
-    Section, CardBlock, NavigationItem, DropdownItem, Footer
+    Section, CardBlock, NavigationItem, DropdownItem, Footer, ContentSnapshot, BotTraffic,
+    ContactMessage,
 )
+from .pagination import EstimatedCountPaginator
+from .search import parse_terms, search_item_ids
 from .section_registry import SECTION_TYPES, get_card_schema
 
+SECTIONS_DATA_CACHE_SECONDS = 60 * 60 * 24 * 365
+
+
+def get_sections_data_version():
+    """Short version string that changes whenever a section is added, removed or edited"""
+    stats = Section.objects.aggregate(count=Count('id'), last=Max('updated_at'), top=Max('id'))
+    raw = f"{stats['count']}:{stats['top']}:{stats['last'].isoformat() if stats['last'] else ''}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
 
 # Sites framework is not used in this project
 
@@ -100,6 +120,9 @@ class SortableInlineFormSet(BaseInlineFormSet):
 
 # --- Forms ---
 class CardBlockAdminForm(forms.ModelForm):
+    # Set by CardBlockAdmin.get_form so the section is only looked up once per request
+    resolved_section_type = None
+
     class Meta:
         model = CardBlock
         fields = '__all__'
@@ -156,6 +179,8 @@ class CardBlockAdminForm(forms.ModelForm):
                 self.initial[field_name] = initial_value
 
     def _determine_section_type(self):
+        if self.resolved_section_type:
+            return self.resolved_section_type
         section = getattr(self.instance, 'section', None)
         if not section:
             section_id = self.data.get('section') or self.initial.get('section')
@@ -249,6 +274,36 @@ class HeroBackgroundImageInline(SortableAdminMixin, admin.TabularInline):
             )
         return format_html('<span style="color:#999;">No image</span>')
 
+class UniqueVisitorsAdminMixin:
+    """Adds a "Unique visitors" changelist column estimated from the visitor sketches"""
+    visitor_item_type = None
+
+    def get_changelist_instance(self, request):
+        from .visitors import get_unique_visitors
+
+        changelist = super().get_changelist_instance(request)
+        # One query for the whole page; the result list is evaluated here and reused by the template
+        rows = list(changelist.result_list)
+        estimates = get_unique_visitors(self.visitor_item_type, [obj.pk for obj in rows])
+        for obj in rows:
+            obj.unique_visitor_estimate = estimates[obj.pk]
+        return changelist
+
+    @admin.display(description="Unique visitors")
+    def unique_visitors(self, obj):
+        return getattr(obj, 'unique_visitor_estimate', '-')
+
+
+class FullTextSearchAdminMixin:
+    """Answers the changelist search box from the full-text index instead of icontains scans"""
+    search_item_type = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not parse_terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search_item_ids(search_term, self.search_item_type)), False
+
+
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(ModelAdmin, TabbedTranslationAdmin):
     formfield_overrides = {
@@ -305,11 +360,13 @@ class SiteSettingsAdmin(ModelAdmin, TabbedTranslationAdmin):
         )
 
 @admin.register(Section)
-class SectionAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
+class SectionAdmin(SortableAdminMixin, UniqueVisitorsAdminMixin, FullTextSearchAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     formfield_overrides = {
         models.TextField: {'widget': CKEditor5Widget(config_name='default')},
     }
-    list_display = ('name', 'layout_badge', 'color_preview', 'grid_info', 'is_active_badge', 'order', 'view_count')
+    list_display = ('name', 'layout_badge', 'color_preview', 'grid_info', 'card_count', 'is_active_badge', 'order', 'view_count', 'unique_visitors')
+    visitor_item_type = 'section'
+    search_item_type = 'section'
     list_filter = ('section_type', 'is_active', 'vertical_alignment', 'horizontal_alignment')
     search_fields = ('name', 'description')
     list_editable = ('order',)
@@ -344,6 +401,16 @@ class SectionAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     )
     
     readonly_fields = ('view_count', 'created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # One grouped query instead of a COUNT per row for the card column
+        return super().get_queryset(request).annotate(card_count=Count('card_block'))
+
+    @admin.display(description="Cards", ordering='card_count')
+    def card_count(self, obj):
+        return obj.get_preview_data()['card_count']
     
     @admin.display(description="Layout", ordering='section_type')
     def layout_badge(self, obj):
@@ -400,66 +467,19 @@ class SectionAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     @admin.action(description="Duplicate selected sections")
     def duplicate_section(self, request, queryset):
         """Duplicate sections with all their card blocks"""
-        for section in queryset:
-            # Create a copy of the section
-            section_copy = Section(
-                name=f"{section.name} (Copy)",
-                description=section.description,
-                rows=section.rows,
-                columns=section.columns,
-                card_gap=section.card_gap,
-                vertical_alignment=section.vertical_alignment,
-                horizontal_alignment=section.horizontal_alignment,
-                section_bg_color=section.section_bg_color,
-                section_text_color=section.section_text_color,
-                title_font_size=section.title_font_size,
-                section_type=section.section_type,
-                cta_label=section.cta_label,
-                cta_url=section.cta_url,
-                cta_bg_color=section.cta_bg_color,
-                cta_text_color=section.cta_text_color,
-                cta_target=section.cta_target,
-                order=section.order + 1000,  # Place after original
-                is_active=False  # Start as inactive
-            )
-            section_copy.save()
-            
-            # Duplicate all card blocks
-            for card_block in section.card_block.all():
-                card_block_copy = CardBlock(
-                    section=section_copy,
-                    title=card_block.title,
-                    text=card_block.text,
-                    icon=card_block.icon,
-                    icon_size=card_block.icon_size,
-                    icon_color=card_block.icon_color,
-                    card_bg_color=card_block.card_bg_color,
-                    card_text_color=card_block.card_text_color,
-                    icon_layout=card_block.icon_layout,
-                    image=card_block.image,
-                    image_alt=card_block.image_alt,
-                    video_file=card_block.video_file,
-                    video_thumbnail=card_block.video_thumbnail,
-                    video_url=card_block.video_url,
-                    cta_label=card_block.cta_label,
-                    cta_url=card_block.cta_url,
-                    button_color=card_block.button_color,
-                    button_text_color=card_block.button_text_color,
-                    button_target=card_block.button_target,
-                    payload=card_block.payload,
-                    order=card_block.order,
-                    is_active=card_block.is_active
-                )
-                card_block_copy.save()
-                
-        self.message_user(request, f"Successfully duplicated {queryset.count()} section(s).")
+        from .cloning import clone_sections
+
+        # Copies are placed after the originals and start as inactive
+        copies = clone_sections(queryset)
+        self.message_user(request, f"Successfully duplicated {len(copies)} section(s).")
 
 @admin.register(NavigationItem)
-class NavigationItemAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
+class NavigationItemAdmin(SortableAdminMixin, UniqueVisitorsAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     formfield_overrides = {
         models.TextField: {'widget': CKEditor5Widget(config_name='default')},
     }
-    list_display = ('label', 'url', 'is_active', 'is_dropdown', 'is_button', 'order', 'is_active_badge', 'click_count')
+    list_display = ('label', 'url', 'is_active', 'is_dropdown', 'dropdown_item_count', 'is_button', 'order', 'is_active_badge', 'click_count', 'unique_visitors')
+    visitor_item_type = 'nav'
     list_filter = ('is_dropdown', 'is_button')
     search_fields = ('label', 'url')
     list_editable = ('order',)
@@ -489,8 +509,17 @@ class NavigationItemAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin
     )
     
     readonly_fields = ('click_count', 'created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     inlines = [DropdownItemInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(dropdown_item_count=Count('dropdown_items'))
+
+    @admin.display(description="Dropdown Items", ordering='dropdown_item_count')
+    def dropdown_item_count(self, obj):
+        return obj.get_preview_data()['dropdown_item_count']
     
     @admin.display(description="Status", boolean=True, ordering='is_active')
     def is_active_badge(self, obj):
@@ -503,11 +532,12 @@ class NavigationItemAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin
         )
 
 @admin.register(Hero)
-class HeroAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
+class HeroAdmin(SortableAdminMixin, UniqueVisitorsAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     formfield_overrides = {
         models.TextField: {'widget': CKEditor5Widget(config_name='default')},
     }
-    list_display = ('title', 'layout_type', 'is_active_badge', 'order', 'view_count', 'cta_click_count')
+    list_display = ('title', 'layout_type', 'media_counts', 'is_active_badge', 'order', 'view_count', 'cta_click_count', 'unique_visitors')
+    visitor_item_type = 'hero'
     list_filter = ('layout_type', 'is_active')
     search_fields = ('title',)
     list_editable = ('order',)
@@ -545,6 +575,20 @@ class HeroAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     
     readonly_fields = ('view_count', 'cta_click_count', 'created_at', 'updated_at')
     inlines = [RotatingTextItemInline, HeroBackgroundImageInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # distinct=True because both joins fan out from the same hero row
+        return super().get_queryset(request).annotate(
+            rotating_text_count=Count('rotating_texts', distinct=True),
+            background_image_count=Count('background_images', distinct=True),
+        )
+
+    @admin.display(description="Texts / Images")
+    def media_counts(self, obj):
+        preview = obj.get_preview_data()
+        return f"{preview['rotating_text_count']} / {preview['background_image_count']}"
     
     @admin.display(description="Layout", ordering='layout_type')
     def layout_type(self, obj):
@@ -605,13 +649,19 @@ class FooterAdmin(ModelAdmin, TabbedTranslationAdmin):
 
 # Register CardBlock separately in admin
 @admin.register(CardBlock)
-class CardBlockAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
+class CardBlockAdmin(SortableAdminMixin, UniqueVisitorsAdminMixin, FullTextSearchAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     form = CardBlockAdminForm
     formfield_overrides = {
         models.TextField: {'widget': CKEditor5Widget(config_name='default')},
     }
-    list_display = ('title', 'section', 'order', 'is_active_badge', 'click_count')
-    list_filter = ('section', 'is_active')
+    list_display = ('title', 'section', 'order', 'is_active_badge', 'click_count', 'unique_visitors')
+    visitor_item_type = 'card'
+    search_item_type = 'card'
+    list_filter = (('section', AutocompleteSelectFilter), 'is_active')
+    list_filter_submit = True
+    list_select_related = ('section',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('title', 'text')
     list_editable = ('order',)
     sortable_field_name = "order"
@@ -650,29 +700,66 @@ class CardBlockAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
     class Media:
         js = ('admin/js/card_block_dynamic_fields.js',)
     
+    def get_queryset(self, request):
+        # The change form reads obj.section to pick the card layout
+        return super().get_queryset(request).select_related('section')
+
+    def get_urls(self):
+        urls = [
+            path(
+                'sections-data/<str:version>/',
+                self.admin_site.admin_view(self.sections_data_view),
+                name='core_cardblock_sections_data',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def _resolve_section_type(self, request, obj=None):
+        """Resolve the card's section type once per request"""
+        if not hasattr(request, '_card_section_type'):
+            section_type = 'default'
+            if obj and obj.section_id:
+                section_type = obj.section.section_type
+            else:
+                section_id = request.POST.get('section') or request.GET.get('section')
+                if section_id and str(section_id).isdigit():
+                    section_type = (
+                        Section.objects.filter(pk=section_id)
+                        .values_list('section_type', flat=True)
+                        .first()
+                    ) or 'default'
+            request._card_section_type = section_type
+        return request._card_section_type
+
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
-        # Store section type in form for JavaScript access
-        if obj and obj.section:
-            form.section_type = obj.section.section_type
-        elif request.method == 'GET' and 'section' in request.GET:
-            try:
-                section = Section.objects.get(pk=request.GET['section'])
-                form.section_type = section.section_type
-            except Section.DoesNotExist:
-                form.section_type = 'default'
-        else:
-            form.section_type = 'default'
+        # Store section type in form for JavaScript access and so the form skips its own lookup
+        form.section_type = form.resolved_section_type = self._resolve_section_type(request, obj)
         return form
-    
+
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
         extra_context = extra_context or {}
-        # Add all sections with their types for the select dropdown (as JSON string)
-        import json
-        sections = Section.objects.all().values('id', 'section_type', 'name')
-        extra_context['sections_data'] = json.dumps(list(sections))
+        # The section types are fetched by card_block_dynamic_fields.js from a versioned URL
+        extra_context['sections_data_url'] = reverse(
+            f'{self.admin_site.name}:core_cardblock_sections_data',
+            args=[get_sections_data_version()],
+        )
         return super().changeform_view(request, object_id, form_url, extra_context)
-    
+
+    def sections_data_view(self, request, version):
+        """Section id -> type map; the URL changes whenever sections change"""
+        current = get_sections_data_version()
+        if version != current:
+            return redirect(f'{self.admin_site.name}:core_cardblock_sections_data', current)
+        data = cache.get_or_set(
+            f'core:sections_data:{version}',
+            lambda: dict(Section.objects.values_list('id', 'section_type')),
+            SECTIONS_DATA_CACHE_SECONDS,
+        )
+        response = JsonResponse(data)
+        patch_cache_control(response, private=True, max_age=SECTIONS_DATA_CACHE_SECONDS, immutable=True)
+        return response
+
     @admin.display(description="Status", boolean=True, ordering='is_active')
     def is_active_badge(self, obj):
         if obj.is_active:
@@ -682,3 +769,91 @@ class CardBlockAdmin(SortableAdminMixin, ModelAdmin, TabbedTranslationAdmin):
         return format_html(
             '<span style="background-color:#ef4444;color:white;padding:4px 8px;border-radius:4px;font-size:11px;font-weight:600;">INACTIVE</span>'
         )
+
+
+@admin.register(ContentSnapshot)
+class ContentSnapshotAdmin(ModelAdmin):
+    list_display = ('version', 'note', 'is_published_badge', 'created_at', 'published_at')
+    list_filter = ('is_published',)
+    search_fields = ('version', 'note')
+    readonly_fields = ('version', 'note', 'is_published', 'created_at', 'published_at')
+    exclude = ('data',)
+    actions = ['publish_selected_snapshot']
+
+    def has_add_permission(self, request):
+        # Snapshots are created by the publish_content command
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('data')
+
+    @admin.display(description="Status", boolean=True, ordering='is_published')
+    def is_published_badge(self, obj):
+        if obj.is_published:
+            return format_html(
+                '<span style="background-color:#10b981;color:white;padding:4px 8px;border-radius:4px;font-size:11px;font-weight:600;">PUBLISHED</span>'
+            )
+        return format_html(
+            '<span style="background-color:#6b7280;color:white;padding:4px 8px;border-radius:4px;font-size:11px;font-weight:600;">ARCHIVED</span>'
+        )
+
+    @admin.action(description="Publish selected snapshot (rollback)")
+    def publish_selected_snapshot(self, request, queryset):
+        from django.contrib import messages
+        from .snapshots import activate_snapshot
+
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one snapshot to publish.", level=messages.WARNING)
+            return
+        snapshot = activate_snapshot(queryset.get().version)
+        self.message_user(request, f"Published snapshot {snapshot.version}.")
+
+
+@admin.register(BotTraffic)
+class BotTrafficAdmin(ModelAdmin):
+    list_display = ('date', 'bot', 'hits')
+    list_filter = ('bot',)
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        # Rows are written by the bot traffic tally
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(ModelAdmin):
+    list_display = ('name', 'email', 'subject', 'created_at', 'delivered_badge', 'delivery_attempts')
+    list_filter = (('delivered_at', admin.EmptyFieldListFilter), 'created_at')
+    search_fields = ('name', 'email', 'subject', 'message')
+    readonly_fields = (
+        'name', 'email', 'subject', 'message', 'page', 'ip_address',
+        'created_at', 'delivered_at', 'delivery_attempts', 'last_error',
+    )
+    actions = ['resend_messages']
+
+    def has_add_permission(self, request):
+        # Messages come from the contact form
+        return False
+
+    @admin.display(description="Delivered", ordering='delivered_at')
+    def delivered_badge(self, obj):
+        if obj.delivered_at:
+            return format_html(
+                '<span style="background-color:#10b981;color:white;padding:4px 8px;border-radius:4px;font-size:11px;font-weight:600;">SENT</span>'
+            )
+        return format_html(
+            '<span style="background-color:#f59e0b;color:white;padding:4px 8px;border-radius:4px;font-size:11px;font-weight:600;">PENDING</span>'
+        )
+
+    @admin.action(description="Resend selected messages")
+    def resend_messages(self, request, queryset):
+        from .contact import schedule_delivery
+
+        messages_to_send = list(queryset)
+        queryset.update(delivered_at=None, delivery_attempts=0, last_error='')
+        for message in messages_to_send:
+            schedule_delivery(message)
+        self.message_user(request, f"Queued {len(messages_to_send)} message(s) for delivery.")
@@ -0,0 +1,309 @@
+"""
+Read-only JSON content API for EthioSites CMS
+Serves the published snapshot when one is published, like the public views,
+and otherwise reads live rows with values() in the active language
+(modeltranslation rewrites the translated field names), so no model
+instances are built per request. Rich text goes out as its sanitized
+rendered column, under the editor field's name.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import FileField, Q
+from django.http import HttpResponse, JsonResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .models import (
+    CardBlock, DropdownItem, Footer, Hero, HeroBackgroundImage, NavigationItem,
+    RotatingTextItem, Section, SiteSettings
+)
+from .snapshots import get_published_content
+
+SUPPORTED_LANGUAGE_CODES = {code for code, _ in settings.LANGUAGES}
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+SITE_FIELDS = (
+    'id', 'site_name', 'logo_text', 'logo', 'favicon', 'header_bg_color', 'header_text_color',
+)
+FOOTER_FIELDS = (
+    'id', 'description', 'address', 'phone', 'email', 'opening_hours',
+    'facebook_url', 'twitter_url', 'instagram_url', 'linkedin_url',
+)
+NAVIGATION_FIELDS = (
+    'id', 'label', 'url', 'description', 'is_dropdown', 'is_button',
+    'button_color', 'button_text_color', 'order',
+)
+DROPDOWN_FIELDS = ('id', 'label', 'url', 'order')
+HERO_FIELDS = (
+    'id', 'title', 'subtitle_description', 'cta_text', 'cta_link', 'cta_bg_color',
+    'layout_type', 'rotating_text_settimeout', 'image_settimeout', 'bg_color', 'order',
+)
+SECTION_FIELDS = (
+    'id', 'name', 'description', 'section_type', 'rows', 'columns', 'card_gap',
+    'vertical_alignment', 'horizontal_alignment', 'section_bg_color', 'section_text_color',
+    'title_font_size', 'cta_label', 'cta_url', 'cta_bg_color', 'cta_text_color', 'cta_target',
+    'order',
+)
+CARD_FIELDS = (
+    'id', 'section_id', 'title', 'text', 'icon', 'icon_size', 'icon_color', 'card_bg_color',
+    'card_text_color', 'icon_layout', 'image', 'image_alt', 'video_file', 'video_thumbnail',
+    'video_url', 'cta_label', 'cta_url', 'button_color', 'button_text_color', 'button_target',
+    'payload', 'order',
+)
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def api_view(view_func):
+    """Activate the requested language and turn APIError into a JSON error response"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        lang = request.GET.get('lang') or translation.get_language()
+        if lang not in SUPPORTED_LANGUAGE_CODES:
+            lang = settings.LANGUAGE_CODE
+        try:
+            with translation.override(lang):
+                data = view_func(request, *args, **kwargs)
+        except APIError as exc:
+            return JsonResponse({'error': exc.message}, status=exc.status)
+        data['language'] = lang
+        return _json_response(request, data)
+    return require_safe(wrapper)
+
+
+def _json_response(request, data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False)
+    body = body.encode('utf-8')
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.API_CACHE_SECONDS)
+    patch_vary_headers(response, ('Accept-Language',))
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def get_requested_fields(request, allowed):
+    """Parse ?fields= into a tuple of allowed field names, keeping the default order"""
+    raw = request.GET.get('fields')
+    if not raw:
+        return allowed
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in requested)
+
+
+def _value_fields(model, fields):
+    # Related lists are attached after the values() query
+    names = {field.attname for field in model._meta.concrete_fields}
+    return [name for name in dict.fromkeys(fields) if name in names]
+
+
+def _source_field(model, name):
+    """Column an API field is read from: rich text comes from its sanitized rendered column"""
+    return f'{name}_rendered' if name in getattr(model, 'rich_text_fields', ()) else name
+
+
+def _media_urls(model, rows):
+    """Replace stored file names with public URLs"""
+    file_fields = [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and rows and field.name in rows[0]
+    ]
+    for row in rows:
+        for field in file_fields:
+            name = row[field.name]
+            row[field.name] = field.storage.url(name) if name else None
+    return rows
+
+
+def _rows(queryset, fields):
+    model = queryset.model
+    names = _value_fields(model, fields)
+    sources = {name: _source_field(model, name) for name in names}
+    rows = [
+        {name: row[sources[name]] for name in names}
+        for row in queryset.values(*sources.values())
+    ]
+    return _media_urls(model, rows)
+
+
+def _node_rows(model, nodes, fields):
+    """Rows shaped like _rows() from published snapshot nodes"""
+    names = _value_fields(model, fields)
+    file_fields = {field.name for field in model._meta.concrete_fields if isinstance(field, FileField)}
+    rows = []
+    for node in nodes:
+        row = {}
+        for name in names:
+            value = node.get(_source_field(model, name))
+            # Snapshots store files as {'url', 'name'}
+            row[name] = value['url'] if name in file_fields and value else value
+        rows.append(row)
+    return rows
+
+
+def _encode_cursor(order, pk):
+    return base64.urlsafe_b64encode(f"{order}:{pk}".encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        order, pk = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return int(order), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise APIError("Invalid cursor")
+
+
+@api_view
+def site(request):
+    """Active site settings and footer"""
+    fields = get_requested_fields(request, SITE_FIELDS + ('footer',))
+    content = get_published_content()
+    if content is not None:
+        site_settings, footer = content['site_settings'], content['footer']
+        rows = _node_rows(SiteSettings, [site_settings] if site_settings else [], fields)
+        footer = _node_rows(Footer, [footer], FOOTER_FIELDS) if footer else []
+    else:
+        rows = _rows(SiteSettings.objects.filter(is_active=True)[:1], fields)
+        footer = _rows(Footer.objects.filter(is_active=True)[:1], FOOTER_FIELDS) if 'footer' in fields else []
+    data = rows[0] if rows else None
+    if data is not None and 'footer' in fields:
+        data['footer'] = footer[0] if footer else None
+    return {'data': data}
+
+
+@api_view
+def navigation(request):
+    """Navigation tree in display order"""
+    fields = get_requested_fields(request, NAVIGATION_FIELDS + ('dropdown_items',))
+    content = get_published_content()
+    if content is not None:
+        nodes = [item for item in content['navigation_items'] if item['is_active']]
+        if 'dropdown_items' not in fields:
+            return {'data': _node_rows(NavigationItem, nodes, fields)}
+        children = {
+            item['id']: _node_rows(DropdownItem, item['dropdown_items'], DROPDOWN_FIELDS) for item in nodes
+        }
+        items = _node_rows(NavigationItem, nodes, fields + ('id',))
+    else:
+        queryset = NavigationItem.objects.filter(is_active=True).order_by('order')
+        if 'dropdown_items' not in fields:
+            return {'data': _rows(queryset, fields)}
+
+        children = {}
+        dropdowns = DropdownItem.objects.filter(parent__is_active=True).order_by('order')
+        for row in dropdowns.values('parent_id', *DROPDOWN_FIELDS):
+            children.setdefault(row.pop('parent_id'), []).append(row)
+        # id is needed to attach children even when it was not requested
+        items = _rows(queryset, fields + ('id',))
+    for item in items:
+        nav_id = item['id'] if 'id' in fields else item.pop('id')
+        item['dropdown_items'] = children.get(nav_id, [])
+    return {'data': items}
+
+
+@api_view
+def hero(request):
+    """Active hero with rotating texts and background images"""
+    fields = get_requested_fields(request, HERO_FIELDS + ('rotating_texts', 'background_images'))
+    content = get_published_content()
+    if content is not None:
+        node = content['hero']
+        if not node:
+            return {'data': None}
+        data = _node_rows(Hero, [node], fields)[0]
+        if 'rotating_texts' in fields:
+            data['rotating_texts'] = [item['text'] for item in node['rotating_texts']]
+        if 'background_images' in fields:
+            images = _node_rows(HeroBackgroundImage, node['background_images'], ('image',))
+            data['background_images'] = [row['image'] for row in images]
+        return {'data': data}
+
+    rows = _rows(Hero.objects.filter(is_active=True).order_by('order')[:1], fields + ('id',))
+    if not rows:
+        return {'data': None}
+    data = rows[0]
+    hero_id = data['id'] if 'id' in fields else data.pop('id')
+    if 'rotating_texts' in fields:
+        texts = RotatingTextItem.objects.filter(hero_id=hero_id).order_by('order')
+        data['rotating_texts'] = list(texts.values_list('text', flat=True))
+    if 'background_images' in fields:
+        images = _rows(HeroBackgroundImage.objects.filter(hero_id=hero_id).order_by('order'), ('image',))
+        data['background_images'] = [row['image'] for row in images]
+    return {'data': data}
+
+
+@api_view
+def sections(request):
+    """Active sections in display order"""
+    fields = get_requested_fields(request, SECTION_FIELDS)
+    content = get_published_content()
+    if content is not None:
+        return {'data': _node_rows(Section, content['sections'], fields)}
+    return {'data': _rows(Section.objects.filter(is_active=True).order_by('order'), fields)}
+
+
+@api_view
+def cards(request):
+    """Active cards with cursor pagination, optionally filtered by ?section="""
+    fields = get_requested_fields(request, CARD_FIELDS)
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise APIError("limit must be an integer")
+    if limit < 1:
+        raise APIError("limit must be positive")
+
+    section_id = request.GET.get('section')
+    if section_id:
+        if not section_id.isdigit():
+            raise APIError("section must be an id")
+        section_id = int(section_id)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        cursor = _decode_cursor(cursor)
+
+    # Fetch one extra row to know whether another page exists
+    content = get_published_content()
+    if content is not None:
+        # Published sections only hold their active cards
+        nodes = [card for section in content['sections'] for card in section['card_block']]
+        if section_id:
+            nodes = [card for card in nodes if card['section_id'] == section_id]
+        if cursor:
+            nodes = [card for card in nodes if (card['order'], card['id']) > cursor]
+        nodes.sort(key=lambda card: (card['order'], card['id']))
+        rows = _node_rows(CardBlock, nodes[:limit + 1], fields + ('id', 'order'))
+    else:
+        queryset = CardBlock.objects.filter(is_active=True, section__is_active=True)
+        if section_id:
+            queryset = queryset.filter(section_id=section_id)
+        if cursor:
+            order, pk = cursor
+            queryset = queryset.filter(Q(order__gt=order) | Q(order=order, pk__gt=pk))
+        rows = _rows(queryset.order_by('order', 'pk')[:limit + 1], fields + ('id', 'order'))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['order'], rows[-1]['id'])
+    for row in rows:
+        for name in ('id', 'order'):
+            if name not in fields:
+                del row[name]
+    return {'data': rows, 'next_cursor': next_cursor}
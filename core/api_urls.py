@@ -0,0 +1,11 @@
+# core/api_urls.py
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('site/', api.site, name='api_site'),
+    path('navigation/', api.navigation, name='api_navigation'),
+    path('hero/', api.hero, name='api_hero'),
+    path('sections/', api.sections, name='api_sections'),
+    path('cards/', api.cards, name='api_cards'),
+]
@@ -8,3 +8,4 @@ class CoreConfig(AppConfig):
     def ready(self):
         import core.translation
         print("Translation module imported successfully")
+        import core.signals
@@ -0,0 +1,236 @@
+"""
+Front-end asset build for EthioSites CMS
+Compiles the Tailwind utilities the templates use into static/css/tailwind.css
+with the Tailwind CLI, then computes the above-the-fold (header, hero and
+first section) subset of it and static/css/site.css so it can be inlined:
+one file shared by every hero layout and one for pages without a hero.
+"""
+import re
+import shutil
+import subprocess
+from functools import lru_cache
+from html.parser import HTMLParser
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from .models import Hero
+from .snapshots import SnapshotCard, SnapshotList, SnapshotNode
+
+SITE_CSS = 'css/site.css'
+TAILWIND_CSS = 'css/tailwind.css'
+# Outside static/, next to it
+TAILWIND_SOURCE = 'static_src/tailwind.css'
+TAILWIND_TIMEOUT_SECONDS = 120
+CRITICAL_CSS_TEMPLATE = 'css/critical/%s.css'
+# Pages without a hero (navigation pages)
+PAGE_LAYOUT = 'page'
+# The critical CSS file shared by all hero layouts
+HERO_CRITICAL_CSS = 'hero'
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+# Tailwind escapes ':', '/', '.' and brackets in class names (.md\:grid-cols-2)
+_PSEUDO_RE = re.compile(r'(?<!\\)::?[\w-]+(\([^)]*\))?')
+_ATTRIBUTE_RE = re.compile(r'(?<!\\)\[[^\]]*\]')
+_CLASS_RE = re.compile(r'\.((?:[\w-]|\\.)+)')
+_ESCAPE_RE = re.compile(r'\\(.)')
+_ID_RE = re.compile(r'#([\w-]+)')
+_TAG_RE = re.compile(r'(?:^|[\s>+~])([a-z][a-z0-9]*)')
+
+
+def get_static_dir():
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+def get_hero_layouts():
+    return [value for value, _ in Hero._meta.get_field('layout_type').choices]
+
+
+def get_critical_css_name(layout):
+    """The critical CSS file a layout uses"""
+    return PAGE_LAYOUT if layout == PAGE_LAYOUT else HERO_CRITICAL_CSS
+
+
+# --- Tailwind ---
+
+def build_tailwind_css():
+    """
+    Compile static_src/tailwind.css into static/css/tailwind.css. Returns its
+    size, or None when the Tailwind CLI (settings.TAILWIND_BINARY) isn't
+    installed; the committed file is kept then.
+    """
+    binary = shutil.which(settings.TAILWIND_BINARY)
+    if not binary:
+        return None
+    output = get_static_dir() / TAILWIND_CSS
+    subprocess.run(
+        [binary, '--input', str(Path(settings.BASE_DIR) / TAILWIND_SOURCE), '--output', str(output), '--minify'],
+        check=True,
+        timeout=TAILWIND_TIMEOUT_SECONDS,
+        capture_output=True,
+    )
+    return output.stat().st_size
+
+
+# --- Critical CSS ---
+
+class _TokenCollector(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.tags, self.classes, self.ids = set(), set(), set()
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        for name, value in attrs:
+            if name == 'class' and value:
+                self.classes.update(value.split())
+            elif name == 'id' and value:
+                self.ids.add(value)
+
+
+def collect_tokens(html):
+    """Tag names, classes and ids present in an HTML fragment"""
+    collector = _TokenCollector()
+    collector.feed(html)
+    collector.close()
+    return collector
+
+
+def _parse_blocks(css):
+    """Split CSS into top-level (prelude, body) pairs; statements such as @layer a; have no body"""
+    blocks = []
+    depth = start = body_start = 0
+    prelude = ''
+    for index, char in enumerate(css):
+        if char == ';' and depth == 0:
+            blocks.append((css[start:index].strip(), None))
+            start = index + 1
+        elif char == '{':
+            if depth == 0:
+                prelude = css[start:index].strip()
+                body_start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[body_start:index].strip()))
+                start = index + 1
+    return blocks
+
+
+def _selector_matches(selector, tokens):
+    selector = _ATTRIBUTE_RE.sub('', _PSEUDO_RE.sub('', selector)).strip()
+    if not selector or selector == '*':
+        return True
+    classes = {_ESCAPE_RE.sub(r'\1', name) for name in _CLASS_RE.findall(selector)}
+    return (
+        classes <= tokens.classes
+        and set(_ID_RE.findall(selector)) <= tokens.ids
+        and set(_TAG_RE.findall(selector)) <= tokens.tags
+    )
+
+
+def _minify(body):
+    return re.sub(r'\s*([:;,])\s*', r'\1', ' '.join(body.split())).rstrip(';')
+
+
+def filter_css(css, tokens):
+    """Keep only the rules whose selectors can match the collected tokens"""
+    output = []
+    for prelude, body in _parse_blocks(_COMMENT_RE.sub('', css)):
+        if body is None:
+            if prelude:
+                output.append(f"{' '.join(prelude.split())};")
+        elif prelude.startswith(('@media', '@supports', '@layer')):
+            inner = filter_css(body, tokens)
+            if inner:
+                output.append(f"{' '.join(prelude.split())}{{{inner}}}")
+        elif prelude.startswith('@'):
+            output.append(f"{' '.join(prelude.split())}{{{_minify(body)}}}")
+        else:
+            selectors = [
+                ' '.join(selector.split()) for selector in prelude.split(',')
+                if _selector_matches(selector, tokens)
+            ]
+            if selectors:
+                output.append(f"{','.join(selectors)}{{{_minify(body)}}}")
+    return ''.join(output)
+
+
+def _sample_context(layout):
+    """Synthetic content shaped like a published snapshot, one of everything above the fold"""
+    card = SnapshotCard(
+        id=1, title='Sample card', text_rendered='<p>Sample text</p>', icon='star', icon_size=32,
+        icon_layout='top-down', image={'url': '/media/sample.jpg', 'name': 'sample.jpg'},
+        cta_label='Learn more', cta_url='#', payload={},
+    )
+    section = SnapshotNode(
+        id=1, name='Sample section', description_rendered='<p>Sample description</p>', section_type='default',
+        rows=1, columns=3, card_block=SnapshotList([card]),
+    )
+    navigation_items = SnapshotList([
+        SnapshotNode(id=1, label='Home', url='home', is_dropdown=False, is_button=False,
+                     dropdown_items=SnapshotList()),
+        SnapshotNode(id=2, label='About', url='about', is_dropdown=True, is_button=False,
+                     dropdown_items=SnapshotList([SnapshotNode(id=1, label='Team', url='team')])),
+        SnapshotNode(id=3, label='Contact', url='contact', is_dropdown=False, is_button=True,
+                     button_color='#3b82f6', button_text_color='#ffffff', dropdown_items=SnapshotList()),
+    ])
+    context = {
+        'site_settings': SnapshotNode(id=1, site_name='EthioSites', logo_text='', logo=None, favicon=None),
+        'navigation_items': navigation_items,
+        'sections': SnapshotList([section]),
+        'footer': None,
+    }
+    if layout == PAGE_LAYOUT:
+        context['nav_item'] = navigation_items[1]
+        return 'navigation_page.html', context
+    context['hero'] = SnapshotNode(
+        id=1, title='Sample hero', subtitle_description_rendered='<p>Sample subtitle</p>', layout_type=layout,
+        cta_text='Get started', cta_link='#', rotating_texts=SnapshotList([SnapshotNode(text='Sample')]),
+        background_images=SnapshotList([SnapshotNode(image={'url': '/media/sample.jpg', 'name': 'sample.jpg'})]),
+    )
+    return 'index.html', context
+
+
+def render_above_the_fold(layout):
+    """Render the header, hero and first section for a layout with sample content"""
+    template_name, context = _sample_context(layout)
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    request.LANGUAGE_CODE = settings.LANGUAGE_CODE
+    html = render_to_string(template_name, context, request=request)
+    # The footer is never above the fold
+    return html.split('</main>', 1)[0]
+
+
+def build_critical_css():
+    """Write css/critical/hero.css and css/critical/page.css; returns {name: size}"""
+    # In the order base.html loads them
+    css = ''.join(
+        (get_static_dir() / name).read_text(encoding='utf-8') for name in (TAILWIND_CSS, SITE_CSS)
+    )
+    sizes = {}
+    for name, layouts in ((HERO_CRITICAL_CSS, get_hero_layouts()), (PAGE_LAYOUT, [PAGE_LAYOUT])):
+        # Everything any of the layouts shows above the fold
+        html = ''.join(render_above_the_fold(layout) for layout in layouts)
+        critical = filter_css(css, collect_tokens(html))
+        path = get_static_dir() / (CRITICAL_CSS_TEMPLATE % name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(critical + '\n', encoding='utf-8')
+        sizes[name] = len(critical)
+    get_critical_css.cache_clear()
+    return sizes
+
+
+@lru_cache(maxsize=None)
+def get_critical_css(layout):
+    """Built critical CSS for a layout ('' when it has not been built)"""
+    path = finders.find(CRITICAL_CSS_TEMPLATE % get_critical_css_name(layout))
+    if not path:
+        return ''
+    return Path(path).read_text(encoding='utf-8').strip()
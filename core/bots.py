@@ -0,0 +1,101 @@
+"""
+Crawler detection for EthioSites CMS
+User agents are matched against one precompiled regex (results cached per UA
+string), so bot page views can be left out of the content counters. Bot hits
+are tallied in memory and written to BotTraffic in one batch after a
+response has been sent, at most every BOT_TRAFFIC_FLUSH_SECONDS.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BotTraffic
+
+# (family, pattern); the first matching family wins, generic patterns last
+BOT_PATTERNS = (
+    ('googlebot', r'googlebot|google-inspectiontool|adsbot-google|mediapartners-google|apis-google'),
+    ('bingbot', r'bingbot|bingpreview|msnbot'),
+    ('yandex', r'yandex(?:bot|images|metrika)'),
+    ('baidu', r'baiduspider'),
+    ('duckduckgo', r'duckduckbot|duckassistbot'),
+    ('applebot', r'applebot'),
+    ('ai-crawler', r'gptbot|chatgpt-user|oai-searchbot|claudebot|claude-web|anthropic-ai|ccbot|perplexitybot|bytespider|amazonbot|cohere-ai'),
+    ('seo', r'ahrefsbot|semrushbot|mj12bot|dotbot|petalbot|seznambot|dataforseobot|blexbot'),
+    ('link-preview', r'facebookexternalhit|facebot|twitterbot|linkedinbot|slackbot|telegrambot|whatsapp|discordbot|skypeuripreview|pinterestbot|redditbot|embedly|vkshare'),
+    ('uptime', r'uptimerobot|pingdom|statuscake|site24x7|better ?uptime|freshping|newrelicpinger|datadog|elb-healthchecker|kube-probe|googlehc'),
+    ('http-client', r'^(?:curl|wget|python-requests|python-urllib|python-httpx|aiohttp|go-http-client|java/|okhttp|libwww-perl|httpie|axios|node-fetch|scrapy)'),
+    ('headless', r'headlesschrome|phantomjs|lighthouse|pagespeed|gtmetrix|chrome-lighthouse'),
+    ('other', r'bot\b|crawl|spider|slurp|scrap|fetcher|monitor|preview|archiver|checker'),
+)
+
+_BOT_RE = re.compile(
+    '|'.join(f'(?P<g{index}>{pattern})' for index, (_, pattern) in enumerate(BOT_PATTERNS)),
+    re.IGNORECASE,
+)
+_FAMILIES = {f'g{index}': family for index, (family, _) in enumerate(BOT_PATTERNS)}
+
+
+@lru_cache(maxsize=4096)
+def classify_user_agent(user_agent):
+    """Return the bot family for a user agent, or None for a browser"""
+    if not user_agent or not user_agent.strip():
+        return 'empty'
+    match = _BOT_RE.search(user_agent)
+    return _FAMILIES[match.lastgroup] if match else None
+
+
+def get_bot_family(request):
+    """Bot family of the request's user agent (None for browsers)"""
+    return classify_user_agent(request.META.get('HTTP_USER_AGENT', '')[:512])
+
+
+# --- Bot traffic tally ---
+
+_tally_lock = threading.Lock()
+_tally = Counter()
+_last_flush = time.monotonic()
+
+
+def record_bot_hit(family):
+    """Count a bot page view in memory"""
+    with _tally_lock:
+        _tally[(timezone.localdate(), family)] += 1
+
+
+def flush_bot_traffic_if_due(**kwargs):
+    """request_finished handler: flush once BOT_TRAFFIC_FLUSH_SECONDS have passed"""
+    global _last_flush
+    with _tally_lock:
+        interval = getattr(settings, 'BOT_TRAFFIC_FLUSH_SECONDS', 60)
+        if not _tally or time.monotonic() - _last_flush < interval:
+            return
+        _last_flush = time.monotonic()
+    flush_bot_traffic()
+
+
+def flush_bot_traffic():
+    """Write the buffered bot hits, one UPDATE (or INSERT) per day and family"""
+    with _tally_lock:
+        pending = dict(_tally)
+        _tally.clear()
+    try:
+        with transaction.atomic():
+            for (date, family), hits in pending.items():
+                updated = BotTraffic.objects.filter(date=date, bot=family).update(hits=F('hits') + hits)
+                if not updated:
+                    _, created = BotTraffic.objects.get_or_create(date=date, bot=family, defaults={'hits': hits})
+                    if not created:
+                        BotTraffic.objects.filter(date=date, bot=family).update(hits=F('hits') + hits)
+    except Exception:
+        # Nothing was written; keep the hits for the next flush
+        with _tally_lock:
+            _tally.update(pending)
+        raise
+    return sum(pending.values())
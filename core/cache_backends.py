@@ -0,0 +1,237 @@
+"""
+Two-tier cache backend for EthioSites CMS
+A bounded in-process LRU sits in front of a shared cache (memcached, Redis,
+or a file/local-memory stand-in). Content entries (keys starting with one of
+LOCAL_KEY_PREFIXES) are served from process memory after the first shared
+lookup. Every other key, such as locks, counters and throttles, always goes to
+the shared tier.
+
+Local copies are invalidated through version keys. VERSION_KEYS (the content
+generation counters) are re-read from the shared tier at most every
+VERSION_TIMEOUT seconds. A local entry is only served while the versions it
+was cached under are still current, so a generation bump in any process
+reaches every process's memory within VERSION_TIMEOUT.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'LOCATION': 'content',
+            'OPTIONS': {
+                'SHARED': 'shared',              # alias of the shared cache
+                'LOCAL_MAX_BYTES': 32 * 2**20,   # pickled size held in memory
+                'LOCAL_TIMEOUT': 300,            # longest a local copy is trusted
+                'LOCAL_KEY_PREFIXES': ['core:page:'],
+                'VERSION_KEYS': ['core:page-cache:generation'],
+                'VERSION_TIMEOUT': 1,
+            },
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': '...'},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+# Local tiers are shared by every thread of the process, keyed by LOCATION (like LocMemCache)
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """Size-bounded LRU of pickled values, each stamped with the versions it was cached under"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key: (pickled, expires_at, versions)
+        self.size = 0
+        self.versions = {}  # version key: (value, checked_at)
+        self.lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            pickled, expires_at, stamp = entry
+            if stamp != versions or time.monotonic() >= expires_at:
+                self._remove(key)
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout, versions):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._remove(key)
+            if len(pickled) > self.max_bytes:
+                return
+            self.entries[key] = (pickled, time.monotonic() + timeout, versions)
+            self.size += len(pickled)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._remove(key)
+            self.versions.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        self.local_key_prefixes = tuple(options.get('LOCAL_KEY_PREFIXES', ()))
+        self.version_keys = tuple(options.get('VERSION_KEYS', ()))
+        self.version_timeout = options.get('VERSION_TIMEOUT', 1)
+        with _tiers_lock:
+            self.local = _tiers.setdefault(location, LocalTier(options.get('LOCAL_MAX_BYTES', 32 * 2**20)))
+
+    @property
+    def shared(self):
+        # The cache handler hands out one connection per thread
+        return caches[self.shared_alias]
+
+    def _is_local(self, key):
+        return key not in self.version_keys and key.startswith(self.local_key_prefixes)
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    # --- Version keys ---
+
+    def _versions(self):
+        """Current value of every version key, re-read from the shared tier once they're VERSION_TIMEOUT old"""
+        now = time.monotonic()
+        known = self.local.versions
+        expired = [
+            key for key in self.version_keys
+            if key not in known or now - known[key][1] >= self.version_timeout
+        ]
+        if expired:
+            values = self.shared.get_many(expired)
+            for key in expired:
+                known[key] = (values.get(key), now)
+        return tuple(known[key][0] for key in self.version_keys)
+
+    def _remember_version(self, key, value):
+        if key in self.version_keys:
+            self.local.versions[key] = (value, time.monotonic())
+
+    def _forget(self, key, version=None):
+        self.local.delete(self._local_key(key, version))
+        self.local.versions.pop(key, None)
+
+    def _keep_local(self, key, value, timeout, version, versions=None):
+        if not self._is_local(key):
+            return
+        timeout = self.get_backend_timeout(timeout)
+        timeout = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+        if timeout > 0:
+            self.local.set(self._local_key(key, version), value, timeout, versions or self._versions())
+
+    # --- Cache API ---
+
+    def get(self, key, default=None, version=None):
+        if key in self.version_keys:
+            value = self._versions()[self.version_keys.index(key)]
+            return default if value is None else value
+        if not self._is_local(key):
+            return self.shared.get(key, default, version=version)
+
+        versions = self._versions()
+        value = self.local.get(self._local_key(key, version), versions)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._keep_local(key, value, self.local_timeout, version, versions)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, remote = {}, []
+        versions = self._versions() if any(self._is_local(key) for key in keys) else None
+        for key in keys:
+            value = self.local.get(self._local_key(key, version), versions) if self._is_local(key) else _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            values = self.shared.get_many(remote, version=version)
+            for key, value in values.items():
+                self._keep_local(key, value, self.local_timeout, version, versions)
+            found.update(values)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember_version(key, value)
+        self._keep_local(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key in failed:
+                self._forget(key, version)
+            else:
+                self._remember_version(key, value)
+                self._keep_local(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember_version(key, value)
+            self._keep_local(key, value, timeout, version)
+        else:
+            # Someone else's value is in the shared tier
+            self._forget(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._forget(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        value = self.shared.incr(key, delta, version=version)
+        self._remember_version(key, value)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
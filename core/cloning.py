@@ -0,0 +1,82 @@
+"""
+Bulk cloning for EthioSites CMS
+Copies sections together with their card blocks in a fixed number of
+queries, inside one transaction, keeping every translated column and payload.
+"""
+from django.conf import settings
+from django.db import transaction
+from modeltranslation.utils import build_localized_fieldname
+
+from . import page_cache, search, sitemaps
+from .models import CardBlock, Section
+
+# Analytics start from zero on a copy
+RESET_FIELDS = {
+    Section: ('view_count',),
+    CardBlock: ('click_count',),
+}
+
+
+def _prepare_copy(instance):
+    instance.pk = None
+    instance.id = None
+    instance._state.adding = True
+    for name in RESET_FIELDS.get(type(instance), ()):
+        setattr(instance, name, 0)
+    return instance
+
+
+def _suffix_translations(instance, field_name, suffix):
+    """
+    Suffix every translation. bulk_create writes the base column from the
+    active language's value, so it carries the suffix too.
+    """
+    suffixed = False
+    for language_code, _ in settings.LANGUAGES:
+        attname = build_localized_fieldname(field_name, language_code)
+        value = getattr(instance, attname, None)
+        if value:
+            setattr(instance, attname, f"{value}{suffix}")
+            suffixed = True
+    # Rows saved before the field was translated only have the base column
+    base = instance.__dict__.get(field_name)
+    if base and not suffixed:
+        setattr(instance, field_name, f"{base}{suffix}")
+
+
+def clone_sections(sections, name_suffix=" (Copy)", order_offset=1000, is_active=False):
+    """
+    Clone sections and all their card blocks.
+    Returns a dict mapping each original section id to its new Section.
+    """
+    originals = list(sections)
+    if not originals:
+        return {}
+    original_ids = [section.pk for section in originals]
+
+    with transaction.atomic():
+        copies = []
+        for section in originals:
+            copy = _prepare_copy(section)
+            if name_suffix:
+                _suffix_translations(copy, 'name', name_suffix)
+            copy.order = copy.order + order_offset
+            if is_active is not None:
+                copy.is_active = is_active
+            copies.append(copy)
+        copies = Section.objects.bulk_create(copies)
+        id_map = dict(zip(original_ids, copies))
+
+        cards = []
+        for card in CardBlock.objects.filter(section_id__in=original_ids).order_by('section_id', 'order', 'pk'):
+            new_section = id_map[card.section_id]
+            card = _prepare_copy(card)
+            card.section = new_section
+            cards.append(card)
+        CardBlock.objects.bulk_create(cards)
+        search.index_new_items(copies, cards)
+
+    # bulk_create sends no signals
+    transaction.on_commit(page_cache.bump_generation)
+    transaction.on_commit(sitemaps.bump_generation)
+    return id_map
@@ -0,0 +1,185 @@
+"""
+Contact form pipeline for EthioSites CMS
+Submissions are throttled per client IP by an in-process token bucket (so
+floods are turned away before touching the database), stored with a single
+INSERT and emailed by a background worker once the insert has committed, so
+the response never waits on the mail server.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django import forms
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ContactMessage, Footer, SiteSettings
+
+logger = logging.getLogger(__name__)
+
+# Messages that failed this often are left for an editor to look at
+MAX_DELIVERY_ATTEMPTS = 5
+# Hidden field real visitors leave empty
+HONEYPOT_FIELD = 'website'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ContactForm(forms.ModelForm):
+    class Meta:
+        model = ContactMessage
+        fields = ['name', 'email', 'subject', 'message']
+
+    def clean_message(self):
+        message = self.cleaned_data['message'].strip()
+        if len(message) > settings.CONTACT_MESSAGE_MAX_LENGTH:
+            raise forms.ValidationError(
+                f"Keep the message under {settings.CONTACT_MESSAGE_MAX_LENGTH} characters."
+            )
+        return message
+
+    def validate_unique(self):
+        # Nothing is unique, so skip the queries ModelForm would otherwise run
+        pass
+
+
+# --- Throttling ---
+
+class TokenBucket:
+    """
+    Per-key token bucket: each key holds up to `capacity` tokens and gains one
+    every `refill_seconds`. Kept in process memory, so the limit applies per
+    worker process.
+    """
+
+    def __init__(self, capacity, refill_seconds, max_keys=10000):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _refilled(self, tokens, updated, now):
+        if self.refill_seconds <= 0:
+            return self.capacity
+        return min(self.capacity, tokens + (now - updated) / self.refill_seconds)
+
+    def consume(self, key):
+        """Take a token for key; False when the bucket is empty"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = self._refilled(tokens, updated, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True
+
+    def _prune(self, now):
+        # Full buckets carry no state worth keeping
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if self._refilled(tokens, updated, now) >= self.capacity:
+                del self._buckets[key]
+
+
+@lru_cache(maxsize=None)
+def _get_bucket(capacity, refill_seconds):
+    return TokenBucket(capacity, refill_seconds)
+
+
+def get_contact_throttle():
+    return _get_bucket(settings.CONTACT_THROTTLE_CAPACITY, settings.CONTACT_THROTTLE_REFILL_SECONDS)
+
+
+def get_client_ip(request):
+    # Behind a proxy, REMOTE_ADDR must be set from the forwarded header by the server
+    return request.META.get('REMOTE_ADDR') or None
+
+
+# --- Delivery ---
+
+def get_recipients():
+    """CONTACT_RECIPIENTS, else the contact email shown in the footer"""
+    if settings.CONTACT_RECIPIENTS:
+        return list(settings.CONTACT_RECIPIENTS)
+    footer = Footer.objects.filter(is_active=True).only('email').first()
+    if footer and footer.email:
+        return [footer.email]
+    return []
+
+
+def build_email(message, recipients):
+    site_settings = SiteSettings.objects.filter(is_active=True).only('site_name').first()
+    site_name = site_settings.site_name if site_settings else 'Website'
+    body = (
+        f"Name: {message.name}\n"
+        f"Email: {message.email}\n"
+        f"Sent: {message.created_at:%Y-%m-%d %H:%M %Z}\n\n"
+        f"{message.message}\n"
+    )
+    return EmailMessage(
+        subject=f"[{site_name}] {message.subject or 'Contact form message'}",
+        body=body,
+        to=recipients,
+        reply_to=[message.email],
+    )
+
+
+def deliver_message(message):
+    """Email a stored message; returns whether it was sent"""
+    recipients = get_recipients()
+    if not recipients:
+        logger.warning("No contact recipients configured; message %s kept undelivered", message.pk)
+        return False
+    try:
+        build_email(message, recipients).send()
+    except Exception as exc:
+        logger.warning("Delivering contact message %s failed: %s", message.pk, exc)
+        ContactMessage.objects.filter(pk=message.pk).update(
+            delivery_attempts=F('delivery_attempts') + 1, last_error=str(exc)[:1000],
+        )
+        return False
+    ContactMessage.objects.filter(pk=message.pk).update(
+        delivered_at=timezone.now(), delivery_attempts=F('delivery_attempts') + 1, last_error='',
+    )
+    return True
+
+
+def get_pending_messages():
+    return ContactMessage.objects.filter(
+        delivered_at__isnull=True, delivery_attempts__lt=MAX_DELIVERY_ATTEMPTS,
+    ).order_by('created_at')
+
+
+def _deliver_in_thread(message_id):
+    try:
+        message = ContactMessage.objects.filter(pk=message_id, delivered_at__isnull=True).first()
+        if message is not None:
+            deliver_message(message)
+    except Exception:
+        logger.exception("Contact delivery crashed for message %s", message_id)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='contact-mail')
+        return _executor
+
+
+def schedule_delivery(message):
+    """Queue the email for after the current transaction commits"""
+    message_id = message.pk
+    transaction.on_commit(lambda: _get_executor().submit(_deliver_in_thread, message_id))
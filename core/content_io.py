@@ -0,0 +1,277 @@
+"""
+Content import/export for EthioSites CMS
+Content is streamed as JSON Lines, one row per line with parents before
+children. Media files are copied next to it in parallel, stored once per
+SHA-256 so identical uploads are only transferred once.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from modeltranslation.translator import NotRegistered, translator
+
+from . import page_cache, search, sitemaps
+from .models import (
+    CardBlock, DropdownItem, Footer, Hero, HeroBackgroundImage, NavigationItem,
+    RotatingTextItem, Section, SiteSettings
+)
+from .rich_text import render_instance_fields
+
+CONTENT_FILE = 'content.jsonl'
+MEDIA_MANIFEST_FILE = 'media.jsonl'
+MEDIA_DIR = 'media'
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+
+# Parents always come before their children
+EXPORT_MODELS = (
+    SiteSettings,
+    Footer,
+    Section,
+    CardBlock,
+    Hero,
+    RotatingTextItem,
+    HeroBackgroundImage,
+    NavigationItem,
+    DropdownItem,
+)
+
+# Analytics belong to the environment the content was viewed in
+COUNTER_FIELDS = {'view_count', 'click_count', 'cta_click_count'}
+
+
+class ContentImportError(Exception):
+    pass
+
+
+def _model_label(model):
+    return model._meta.label_lower
+
+
+def _translated_base_fields(model):
+    try:
+        return set(translator.get_options_for_model(model).fields)
+    except NotRegistered:
+        return set()
+
+
+def get_export_fields(model):
+    """Concrete fields written for a model: everything but the pk, counters and
+    the modeltranslation base columns (the _en/_am columns carry the text)"""
+    skipped = COUNTER_FIELDS | _translated_base_fields(model)
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in skipped
+    ]
+
+
+def _file_fields(model):
+    return [field for field in get_export_fields(model) if isinstance(field, models.FileField)]
+
+
+# --- Export ---
+
+def _copy_media(storage, name, media_dir):
+    """Copy one stored file into the export, named by its SHA-256"""
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=media_dir)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file, storage.open(name, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                temp_file.write(chunk)
+        sha256 = digest.hexdigest()
+        blob = f"{sha256}{Path(name).suffix.lower()}"
+        target = Path(media_dir) / blob
+        if target.exists():
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return {'name': name, 'sha256': sha256, 'file': f"{MEDIA_DIR}/{blob}"}
+
+
+def export_content(output_dir, workers=4):
+    """Write content.jsonl, media.jsonl and the media blobs into output_dir"""
+    output_dir = Path(output_dir)
+    media_dir = output_dir / MEDIA_DIR
+    media_dir.mkdir(parents=True, exist_ok=True)
+
+    media = {}
+    counts = {}
+    with open(output_dir / CONTENT_FILE, 'w', encoding='utf-8') as content_file:
+        for model in EXPORT_MODELS:
+            fields = get_export_fields(model)
+            file_fields = _file_fields(model)
+            label = _model_label(model)
+            counts[label] = 0
+            for instance in model.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+                row = {field.attname: getattr(instance, field.attname) for field in fields}
+                for field in file_fields:
+                    name = row[field.attname].name if row[field.attname] else ''
+                    row[field.attname] = name
+                    if name:
+                        media.setdefault(name, field.storage)
+                content_file.write(json.dumps(
+                    {'model': label, 'id': instance.pk, 'fields': row},
+                    cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'),
+                ))
+                content_file.write('\n')
+                counts[label] += 1
+
+    def copy(item):
+        name, storage = item
+        if not storage.exists(name):
+            return {'name': name, 'missing': True}
+        return _copy_media(storage, name, media_dir)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        entries = list(executor.map(copy, sorted(media.items(), key=lambda item: item[0])))
+
+    with open(output_dir / MEDIA_MANIFEST_FILE, 'w', encoding='utf-8') as manifest:
+        for entry in entries:
+            manifest.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')))
+            manifest.write('\n')
+
+    return counts, entries
+
+
+# --- Import ---
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as source:
+        for line_number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise ContentImportError(f"{path.name}:{line_number}: {exc}")
+
+
+def _file_sha256(storage, name):
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _import_blob(storage, input_dir, name, sha256, blob):
+    """Store one blob, reusing an existing file at the same name with the same hash"""
+    if storage.exists(name) and _file_sha256(storage, name) == sha256:
+        return name
+    with open(input_dir / blob, 'rb') as source:
+        return storage.save(name, File(source, name=os.path.basename(name)))
+
+
+def import_media(input_dir, workers=4):
+    """Copy the exported blobs into storage; returns a map old name -> stored name"""
+    input_dir = Path(input_dir)
+    manifest_path = input_dir / MEDIA_MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    # One upload per distinct blob; the other names pointing at it reuse the stored file
+    by_sha = {}
+    for entry in _read_jsonl(manifest_path):
+        if entry.get('missing'):
+            continue
+        by_sha.setdefault(entry['sha256'], []).append(entry)
+
+    def store(entries):
+        first = entries[0]
+        stored = _import_blob(default_storage, input_dir, first['name'], first['sha256'], first['file'])
+        return {entry['name']: stored for entry in entries}
+
+    name_map = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for results in executor.map(store, by_sha.values()):
+            name_map.update(results)
+    return name_map
+
+
+def import_content(input_dir, workers=4, replace=False):
+    """
+    Import content.jsonl with bulk_create, remapping primary and foreign keys.
+    Everything happens in one transaction; media is copied first.
+    """
+    input_dir = Path(input_dir)
+    content_path = input_dir / CONTENT_FILE
+    if not content_path.exists():
+        raise ContentImportError(f"{content_path} does not exist")
+
+    models_by_label = {_model_label(model): model for model in EXPORT_MODELS}
+    name_map = import_media(input_dir, workers=workers)
+    id_maps = {model: {} for model in EXPORT_MODELS}
+    fields_by_model = {
+        model: {field.attname: field for field in get_export_fields(model)}
+        for model in EXPORT_MODELS
+    }
+    counts = {}
+
+    def flush(model, batch):
+        if not batch:
+            return
+        old_ids = [old_id for old_id, _ in batch]
+        created = model.objects.bulk_create([instance for _, instance in batch])
+        id_maps[model].update(zip(old_ids, (instance.pk for instance in created)))
+        counts[_model_label(model)] = counts.get(_model_label(model), 0) + len(created)
+        batch.clear()
+
+    with transaction.atomic():
+        if replace:
+            for model in (Section, Hero, NavigationItem, SiteSettings, Footer):
+                model.objects.all().delete()
+
+        current_model = None
+        batch = []
+        for row in _read_jsonl(content_path):
+            model = models_by_label.get(row.get('model'))
+            if model is None:
+                raise ContentImportError(f"Unknown model {row.get('model')!r}")
+            if model is not current_model:
+                flush(current_model, batch)
+                current_model = model
+
+            values = {}
+            allowed = fields_by_model[model]
+            for attname, value in row['fields'].items():
+                field = allowed.get(attname)
+                if field is None:
+                    continue
+                if field.is_relation:
+                    parent_ids = id_maps.get(field.related_model, {})
+                    if value not in parent_ids:
+                        raise ContentImportError(
+                            f"{row['model']} {row['id']} points at missing {_model_label(field.related_model)} {value}"
+                        )
+                    value = parent_ids[value]
+                elif isinstance(field, models.FileField) and value:
+                    value = name_map.get(value, value)
+                values[attname] = value
+
+            instance = model(**values)
+            if hasattr(instance, 'rich_text_fields'):
+                # Imported HTML is sanitized like an editor save
+                render_instance_fields(instance)
+            batch.append((row['id'], instance))
+            if len(batch) >= BATCH_SIZE:
+                flush(model, batch)
+        flush(current_model, batch)
+        # bulk_create sends no signals
+        transaction.on_commit(page_cache.bump_generation)
+        transaction.on_commit(sitemaps.bump_generation)
+        transaction.on_commit(search.rebuild_index)
+
+    return counts
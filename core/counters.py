@@ -0,0 +1,143 @@
+"""
+Sharded view and click counters for EthioSites CMS
+Every counted item has COUNTER_SHARDS CounterShard rows per metric. A
+writer adds to one shard picked at random, so concurrent page views of the
+same sections update different rows instead of queueing on one row lock.
+Totals are the sum of the shards, cached for COUNTER_CACHE_SECONDS.
+
+The view_count / click_count / cta_click_count fields on the models are kept
+as materialized totals for the admin, previews and exports: they are copied
+from the shards at most every COUNTER_MATERIALIZE_SECONDS after a response
+has been sent, or on demand with `manage.py materialize_counters`.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .models import CardBlock, CounterShard, Hero, NavigationItem, Section
+
+# item_type: (model, metrics counted for it)
+COUNTED_MODELS = {
+    'hero': (Hero, ('view_count', 'cta_click_count')),
+    'section': (Section, ('view_count',)),
+    'card': (CardBlock, ('click_count',)),
+    'nav': (NavigationItem, ('click_count',)),
+}
+ITEM_TYPES = {model: item_type for item_type, (model, metrics) in COUNTED_MODELS.items()}
+# Held by the process materializing totals; outside the two-tier cache's local prefixes
+MATERIALIZE_LOCK_KEY = 'core:counters:materializing'
+
+_last_materialized = time.monotonic()
+
+
+def _total_key(item_type, metric, item_id):
+    return f'core:counter:{item_type}:{metric}:{item_id}'
+
+
+def create_shards(item_type, item_ids, initial=None):
+    """Add the missing shard rows of items; initial ({item_id: {metric: n}}) goes into shard 0"""
+    initial = initial or {}
+    metrics = COUNTED_MODELS[item_type][1]
+    CounterShard.objects.bulk_create([
+        CounterShard(
+            item_type=item_type, item_id=item_id, metric=metric, shard=shard,
+            count=initial.get(item_id, {}).get(metric, 0) if shard == 0 else 0,
+        )
+        for item_id in item_ids for metric in metrics for shard in range(settings.COUNTER_SHARDS)
+    ], ignore_conflicts=True)
+
+
+def increment(item_type, metric, item_ids, amount=1):
+    """Add amount to one random shard of each item, in one UPDATE"""
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    shards = CounterShard.objects.filter(
+        item_type=item_type, metric=metric, shard=random.randrange(settings.COUNTER_SHARDS),
+    )
+    updated = shards.filter(item_id__in=item_ids).update(count=F('count') + amount)
+    if updated < len(item_ids):
+        # Items added with bulk_create (clones, imports) or before COUNTER_SHARDS grew
+        missing = item_ids - set(shards.filter(item_id__in=item_ids).values_list('item_id', flat=True))
+        create_shards(item_type, missing)
+        shards.filter(item_id__in=missing).update(count=F('count') + amount)
+
+
+def increment_and_get(item_type, metric, item_id, amount=1):
+    """Increment one item and return its total, including this increment"""
+    increment(item_type, metric, [item_id], amount)
+    try:
+        return cache.incr(_total_key(item_type, metric, item_id), amount)
+    except ValueError:
+        # Not cached: summing the shards now includes the increment
+        return get_total(item_type, metric, item_id)
+
+
+def get_totals(item_type, metric, item_ids):
+    """{item_id: total} summed over the shards, each total cached for COUNTER_CACHE_SECONDS"""
+    keys = {_total_key(item_type, metric, item_id): item_id for item_id in item_ids}
+    cached = cache.get_many(list(keys))
+    totals = {keys[key]: value for key, value in cached.items()}
+    missing = [item_id for item_id in item_ids if item_id not in totals]
+    if missing:
+        summed = dict(
+            CounterShard.objects.filter(item_type=item_type, metric=metric, item_id__in=missing)
+            .values('item_id').annotate(total=Sum('count')).values_list('item_id', 'total')
+        )
+        for item_id in missing:
+            total = summed.get(item_id, 0)
+            # add, not set: a total cached and incremented since the sum is fresher
+            key = _total_key(item_type, metric, item_id)
+            if not cache.add(key, total, settings.COUNTER_CACHE_SECONDS):
+                total = cache.get(key, total)
+            totals[item_id] = total
+    return totals
+
+
+def get_total(item_type, metric, item_id):
+    return get_totals(item_type, metric, [item_id])[item_id]
+
+
+def delete_shards(item_type, item_id):
+    CounterShard.objects.filter(item_type=item_type, item_id=item_id).delete()
+
+
+def materialize_counters_if_due(**kwargs):
+    """request_finished handler: materialize once COUNTER_MATERIALIZE_SECONDS have passed, in one process"""
+    global _last_materialized
+    interval = settings.COUNTER_MATERIALIZE_SECONDS
+    if time.monotonic() - _last_materialized < interval:
+        return
+    _last_materialized = time.monotonic()
+    if cache.add(MATERIALIZE_LOCK_KEY, 1, interval):
+        materialize_counters()
+
+
+def materialize_counters():
+    """Copy the shard totals into the models' counter fields; returns how many items changed"""
+    changed = 0
+    for item_type, (model, metrics) in COUNTED_MODELS.items():
+        totals = {
+            metric: dict(
+                CounterShard.objects.filter(item_type=item_type, metric=metric)
+                .values('item_id').annotate(total=Sum('count')).values_list('item_id', 'total')
+            )
+            for metric in metrics
+        }
+        updated = []
+        for item in model.objects.filter(pk__in=set().union(*totals.values())).only('pk', *metrics):
+            stale = [
+                metric for metric in metrics
+                if item.pk in totals[metric] and getattr(item, metric) != totals[metric][item.pk]
+            ]
+            for metric in stale:
+                setattr(item, metric, totals[metric][item.pk])
+            if stale:
+                updated.append(item)
+        # bulk_update sends no signals, so pages and search stay cached
+        model.objects.bulk_update(updated, metrics, batch_size=500)
+        changed += len(updated)
+    return changed
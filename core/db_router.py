@@ -0,0 +1,117 @@
+"""
+Read replicas for EthioSites CMS
+With DATABASE_REPLICA_URLS set, the public pages and the JSON API read site
+content from a randomly picked replica. Everything else stays on the primary
+(the 'default' database):
+- all writes, so view and click counters always update the primary;
+- reads inside a transaction;
+- admin and other non-GET requests;
+- sessions, users and other non-content apps;
+- code running outside a request (commands, background threads).
+
+Staff users get a short-lived cookie after a successful admin save. Until it
+expires their requests read the primary, so they see their own changes
+despite replication lag. Content changes from any source also send public renders to the primary
+for READ_YOUR_WRITES_SECONDS, so lagging content never gets into the page cache.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+
+# Apps whose tables public requests may read from a replica
+REPLICATED_APPS = {'core'}
+PRIMARY_COOKIE = 'read_primary'
+# Read from the shared tier of the two-tier cache, so every process sees a write at once
+RECENT_WRITE_KEY = 'core:replica:primary-until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replicas_enabled():
+    return bool(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside this block, even during a public request"""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def mark_content_written():
+    """Send public reads to the primary until replicas have caught up with a content change"""
+    if replicas_enabled():
+        cache.set(RECENT_WRITE_KEY, time.time() + settings.READ_YOUR_WRITES_SECONDS, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def content_recently_written():
+    return (cache.get(RECENT_WRITE_KEY) or 0) > time.time()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or model._meta.app_label not in REPLICATED_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+@lru_cache(maxsize=None)
+def _admin_prefix():
+    return reverse('admin:index')
+
+
+class ReplicaReadsMiddleware:
+    """Lets public GET requests read from replicas; sets the read-your-writes cookie after staff saves"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def may_use_replicas(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and not request.path.startswith(_admin_prefix())
+            and PRIMARY_COOKIE not in request.COOKIES
+            and not content_recently_written()
+        )
+
+    def __call__(self, request):
+        if not replicas_enabled():
+            return self.get_response(request)
+        token = _replica_reads.set(self.may_use_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        # The admin redirects after a successful save; failed forms render with 200
+        if (
+            request.method not in SAFE_METHODS and request.path.startswith(_admin_prefix())
+            and response.status_code == 302 and request.user.is_staff
+        ):
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,24 @@
+"""
+Management command to build the Tailwind bundle and critical CSS
+"""
+from django.core.management.base import BaseCommand
+
+from core.assets import build_critical_css, build_tailwind_css
+
+
+class Command(BaseCommand):
+    help = 'Compile static/css/tailwind.css, then build the hero and page critical CSS from it and site.css'
+
+    def handle(self, *args, **options):
+        size = build_tailwind_css()
+        if size is None:
+            self.stdout.write(self.style.WARNING(
+                'Tailwind CLI not found (TAILWIND_BINARY); keeping the existing css/tailwind.css'
+            ))
+        else:
+            self.stdout.write(f"tailwind css: {size} bytes")
+
+        for name, size in build_critical_css().items():
+            self.stdout.write(f"critical css {name}: {size} bytes")
+
+        self.stdout.write(self.style.SUCCESS('Successfully built assets'))
@@ -0,0 +1,30 @@
+"""
+Management command to report stale-while-revalidate cache metrics
+"""
+from django.core.management.base import BaseCommand
+
+from core.stale_cache import get_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = 'Show hits, stale serves, misses and regeneration times of the page, menu, site settings and sitemap caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'cache':<12}{'hits':>10}{'stale':>10}{'misses':>10}{'rebuilds':>10}{'mean ms':>10}"
+        )
+        for name, data in get_metrics().items():
+            self.stdout.write(
+                f"{name:<12}{data['hits']:>10}{data['stale_serves']:>10}{data['misses']:>10}"
+                f"{data['regenerations']:>10}{data['mean_regeneration_ms']:>10}"
+            )
+        if options['reset']:
+            reset_metrics()
+            self.stdout.write(self.style.SUCCESS('Metrics reset'))
@@ -0,0 +1,62 @@
+"""
+Management command to clone sections and their card blocks in bulk
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cloning import clone_sections
+from core.models import Section
+
+
+class Command(BaseCommand):
+    help = 'Clone sections with all their card blocks in a single transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'section_ids',
+            nargs='*',
+            type=int,
+            help='IDs of the sections to clone'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Clone every section, i.e. the whole page'
+        )
+        parser.add_argument(
+            '--suffix',
+            type=str,
+            default=' (Copy)',
+            help='Suffix appended to the cloned section names (default: " (Copy)")'
+        )
+        parser.add_argument(
+            '--order-offset',
+            type=int,
+            default=1000,
+            help='Added to the order of each clone (default: 1000)'
+        )
+        parser.add_argument(
+            '--active',
+            action='store_true',
+            help='Make the clones active immediately (default: inactive)'
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            sections = Section.objects.order_by('order', 'pk')
+        elif options['section_ids']:
+            sections = Section.objects.filter(pk__in=options['section_ids']).order_by('order', 'pk')
+            missing = set(options['section_ids']) - set(sections.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Unknown section ids: {', '.join(map(str, sorted(missing)))}")
+        else:
+            raise CommandError('Pass section ids or --all')
+
+        copies = clone_sections(
+            sections,
+            name_suffix=options['suffix'],
+            order_offset=options['order_offset'],
+            is_active=options['active'],
+        )
+        for original_id, copy in copies.items():
+            self.stdout.write(f"{original_id} -> {copy.pk}  {copy.name}")
+        self.stdout.write(self.style.SUCCESS(f'Successfully cloned {len(copies)} section(s)'))
@@ -0,0 +1,40 @@
+"""
+Management command to delete content-addressed media files nothing references
+"""
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.media import find_orphaned_media
+
+
+class Command(BaseCommand):
+    help = 'List (or delete with --delete) hashed media files no longer referenced by any content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=24,
+            help='Keep files modified within this many hours (default: 24)'
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the orphaned files instead of only listing them'
+        )
+
+    def handle(self, *args, **options):
+        orphans = find_orphaned_media(grace_period=timedelta(hours=options['grace_hours']))
+        total_size = 0
+        for name in orphans:
+            total_size += default_storage.size(name)
+            self.stdout.write(name)
+            if options['delete']:
+                default_storage.delete(name)
+
+        action = 'Deleted' if options['delete'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {len(orphans)} orphaned file(s), {total_size / 1024:.1f} KB"
+        ))
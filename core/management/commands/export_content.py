@@ -0,0 +1,37 @@
+"""
+Management command to export CMS content as JSON Lines together with its media
+"""
+from django.core.management.base import BaseCommand
+
+from core.content_io import export_content
+
+
+class Command(BaseCommand):
+    help = 'Export sections, heroes and navigation (all languages) as JSON Lines with media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output_dir',
+            type=str,
+            help='Directory to write content.jsonl, media.jsonl and media/ into'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of parallel media copies (default: 4)'
+        )
+
+    def handle(self, *args, **options):
+        counts, media = export_content(options['output_dir'], workers=options['workers'])
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+
+        missing = [entry['name'] for entry in media if entry.get('missing')]
+        blobs = {entry['sha256'] for entry in media if not entry.get('missing')}
+        for name in missing:
+            self.stdout.write(self.style.WARNING(f"Missing media file: {name}"))
+        self.stdout.write(
+            f"media: {len(media) - len(missing)} file(s), {len(blobs)} unique"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Successfully exported content to {options['output_dir']}"))
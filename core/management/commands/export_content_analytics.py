@@ -4,7 +4,10 @@ Management command to export content analytics data to CSV
 import csv
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from core.models import Section, CardBlock, Hero, NavigationItem
+from core.bots import flush_bot_traffic
+from core.counters import materialize_counters
+from core.models import Section, CardBlock, Hero, NavigationItem, BotTraffic
+from core.visitors import flush_visitor_sketches, get_unique_visitors
 
 class Command(BaseCommand):
     help = 'Export content analytics data to CSV files'
@@ -20,6 +23,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         output_dir = options['output_dir']
         timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+        # Include the sketches still held in memory by this process
+        flush_visitor_sketches()
+        # Bring the counts up to date with the counter shards
+        materialize_counters()
         
         # Export Section analytics
         self.export_sections(f"{output_dir}/sections_analytics_{timestamp}.csv")
@@ -32,6 +39,9 @@ class Command(BaseCommand):
         
         # Export NavigationItem analytics
         self.export_navigation_items(f"{output_dir}/navigation_items_analytics_{timestamp}.csv")
+
+        # Export bot traffic
+        self.export_bot_traffic(f"{output_dir}/bot_traffic_{timestamp}.csv")
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -44,18 +54,21 @@ class Command(BaseCommand):
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = [
                 'id', 'name', 'section_type', 'is_active', 'view_count',
-                'card_count', 'cta_label', 'cta_url', 'created_at', 'updated_at'
+                'unique_visitors', 'card_count', 'cta_label', 'cta_url', 'created_at', 'updated_at'
             ]
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            for section in Section.objects.all():
+            sections = list(Section.objects.all())
+            unique = get_unique_visitors('section', [section.id for section in sections])
+            for section in sections:
                 writer.writerow({
                     'id': section.id,
                     'name': section.name,
                     'section_type': section.get_section_type_display(),
                     'is_active': section.is_active,
                     'view_count': section.view_count,
+                    'unique_visitors': unique[section.id],
                     'card_count': section.card_block.count(),
                     'cta_label': section.cta_label,
                     'cta_url': section.cta_url,
@@ -67,20 +80,23 @@ class Command(BaseCommand):
         """Export card block analytics to CSV"""
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = [
-                'id', 'title', 'section_name', 'is_active', 'click_count',
+                'id', 'title', 'section_name', 'is_active', 'click_count', 'unique_visitors',
                 'has_image', 'has_video', 'has_cta', 'cta_label', 'cta_url',
                 'created_at', 'updated_at'
             ]
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            for card in CardBlock.objects.select_related('section').all():
+            cards = list(CardBlock.objects.select_related('section').all())
+            unique = get_unique_visitors('card', [card.id for card in cards])
+            for card in cards:
                 writer.writerow({
                     'id': card.id,
                     'title': card.title,
                     'section_name': card.section.name if card.section else '',
                     'is_active': card.is_active,
                     'click_count': card.click_count,
+                    'unique_visitors': unique[card.id],
                     'has_image': bool(card.image),
                     'has_video': bool(card.video_file or card.video_url),
                     'has_cta': bool(card.cta_label and card.cta_url),
@@ -95,13 +111,15 @@ class Command(BaseCommand):
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = [
                 'id', 'title', 'layout_type', 'is_active', 'view_count',
-                'cta_click_count', 'rotating_text_count', 'background_image_count',
+                'cta_click_count', 'unique_visitors', 'rotating_text_count', 'background_image_count',
                 'cta_text', 'cta_link', 'created_at', 'updated_at'
             ]
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            for hero in Hero.objects.all():
+            heroes = list(Hero.objects.all())
+            unique = get_unique_visitors('hero', [hero.id for hero in heroes])
+            for hero in heroes:
                 writer.writerow({
                     'id': hero.id,
                     'title': hero.title,
@@ -109,6 +127,7 @@ class Command(BaseCommand):
                     'is_active': hero.is_active,
                     'view_count': hero.view_count,
                     'cta_click_count': hero.cta_click_count,
+                    'unique_visitors': unique[hero.id],
                     'rotating_text_count': hero.rotating_texts.count(),
                     'background_image_count': hero.background_images.count(),
                     'cta_text': hero.cta_text,
@@ -122,12 +141,14 @@ class Command(BaseCommand):
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = [
                 'id', 'label', 'url', 'is_active', 'is_dropdown', 'is_button',
-                'click_count', 'dropdown_item_count', 'created_at', 'updated_at'
+                'click_count', 'unique_visitors', 'dropdown_item_count', 'created_at', 'updated_at'
             ]
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            for nav_item in NavigationItem.objects.prefetch_related('dropdown_items').all():
+            nav_items = list(NavigationItem.objects.prefetch_related('dropdown_items').all())
+            unique = get_unique_visitors('nav', [nav_item.id for nav_item in nav_items])
+            for nav_item in nav_items:
                 writer.writerow({
                     'id': nav_item.id,
                     'label': nav_item.label,
@@ -136,7 +157,18 @@ class Command(BaseCommand):
                     'is_dropdown': nav_item.is_dropdown,
                     'is_button': nav_item.is_button,
                     'click_count': nav_item.click_count,
+                    'unique_visitors': unique[nav_item.id],
                     'dropdown_item_count': nav_item.dropdown_items.count(),
                     'created_at': nav_item.created_at,
                     'updated_at': nav_item.updated_at,
-                })
\ No newline at end of file
+                })
+
+    def export_bot_traffic(self, filename):
+        """Export daily bot hits per crawler family to CSV"""
+        flush_bot_traffic()
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['date', 'bot', 'hits'])
+            writer.writeheader()
+
+            for row in BotTraffic.objects.all():
+                writer.writerow({'date': row.date, 'bot': row.bot, 'hits': row.hits})
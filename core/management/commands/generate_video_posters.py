@@ -0,0 +1,26 @@
+"""
+Management command to extract poster frames for card videos without a thumbnail
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import CardBlock
+from core.video import extract_poster
+
+
+class Command(BaseCommand):
+    help = 'Extract a video_thumbnail poster frame (via ffmpeg) for cards with a video but no thumbnail'
+
+    def handle(self, *args, **options):
+        cards = CardBlock.objects.exclude(video_file='').exclude(video_file__isnull=True).filter(
+            Q(video_thumbnail='') | Q(video_thumbnail__isnull=True)
+        )
+        created = 0
+        for card in cards.iterator():
+            name = extract_poster(card)
+            if name:
+                created += 1
+                self.stdout.write(f"{card.pk}: {name}")
+            else:
+                self.stdout.write(self.style.WARNING(f"{card.pk}: no poster extracted"))
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated {created} poster(s)'))
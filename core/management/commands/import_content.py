@@ -0,0 +1,42 @@
+"""
+Management command to import CMS content written by export_content
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.content_io import ContentImportError, import_content
+
+
+class Command(BaseCommand):
+    help = 'Import content exported with export_content, assigning new ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input_dir',
+            type=str,
+            help='Directory created by export_content'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of parallel media copies (default: 4)'
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Delete existing sections, heroes, navigation, site settings and footers first'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = import_content(
+                options['input_dir'],
+                workers=options['workers'],
+                replace=options['replace'],
+            )
+        except ContentImportError as exc:
+            raise CommandError(str(exc))
+
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(f'Successfully imported {sum(counts.values())} object(s)'))
@@ -0,0 +1,14 @@
+"""
+Management command to copy sharded counter totals into the content models
+"""
+from django.core.management.base import BaseCommand
+
+from core.counters import materialize_counters
+
+
+class Command(BaseCommand):
+    help = 'Update the view and click counts shown in the admin and exports from the counter shards'
+
+    def handle(self, *args, **options):
+        changed = materialize_counters()
+        self.stdout.write(self.style.SUCCESS(f'Updated counts of {changed} items'))
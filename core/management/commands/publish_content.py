@@ -0,0 +1,57 @@
+"""
+Management command to publish, list and roll back content snapshots
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ContentSnapshot
+from core.snapshots import activate_snapshot, publish_snapshot, unpublish_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Publish the current content as an immutable snapshot, or roll back to a previous one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--note',
+            type=str,
+            default='',
+            help='Short note stored with the new snapshot'
+        )
+        parser.add_argument(
+            '--rollback',
+            type=str,
+            metavar='VERSION',
+            help='Publish an existing snapshot instead of creating a new one'
+        )
+        parser.add_argument(
+            '--unpublish',
+            action='store_true',
+            help='Stop serving snapshots and render live content again'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List existing snapshots, newest first'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for snapshot in ContentSnapshot.objects.defer('data'):
+                marker = '*' if snapshot.is_published else ' '
+                self.stdout.write(f"{marker} {snapshot.version}  {snapshot.created_at:%Y-%m-%d %H:%M}  {snapshot.note}")
+            return
+
+        if options['unpublish']:
+            unpublish_snapshots()
+            self.stdout.write(self.style.SUCCESS('Snapshots unpublished; serving live content'))
+            return
+
+        if options['rollback']:
+            try:
+                snapshot = activate_snapshot(options['rollback'])
+            except ContentSnapshot.DoesNotExist:
+                raise CommandError(f"No snapshot with version {options['rollback']}")
+        else:
+            snapshot = publish_snapshot(note=options['note'])
+
+        self.stdout.write(self.style.SUCCESS(f'Published snapshot {snapshot.version}'))
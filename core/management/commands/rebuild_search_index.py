@@ -0,0 +1,14 @@
+"""
+Management command to rebuild the full-text search documents
+"""
+from django.core.management.base import BaseCommand
+
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the search documents for every section and card (e.g. after migrating or a raw import)'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {count} search document(s)'))
@@ -0,0 +1,20 @@
+"""
+Management command to email contact messages the background worker could not deliver
+"""
+from django.core.management.base import BaseCommand
+
+from core.contact import deliver_message, get_pending_messages
+
+
+class Command(BaseCommand):
+    help = 'Retry delivery of undelivered contact form messages (e.g. after a mail server outage)'
+
+    def handle(self, *args, **options):
+        sent = failed = 0
+        for message in get_pending_messages().iterator():
+            if deliver_message(message):
+                sent += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"{message.pk}: not delivered"))
+        self.stdout.write(self.style.SUCCESS(f'Successfully delivered {sent} message(s), {failed} failed'))
@@ -0,0 +1,136 @@
+"""
+Management command to pre-render public pages after a deploy or content publish
+The pages are cached by this process, so CACHE_URL must point at a cache the
+web processes share (Redis, memcached or a file cache); with the default
+locmemcache:// the command refuses to run.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import NoReverseMatch, reverse
+
+from core.cache_backends import TwoTierCache
+from core.models import NavigationItem
+from core.views import WARMUP_HEADER, get_warmup_token
+
+
+class Command(BaseCommand):
+    help = 'Render every public page in every language to warm the page and template caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of pages rendered concurrently (default: 4)'
+        )
+        parser.add_argument(
+            '--host',
+            type=str,
+            default=None,
+            help='Host header to send (default: first entry of ALLOWED_HOSTS)'
+        )
+        parser.add_argument(
+            '--allow-local-cache',
+            action='store_true',
+            help='Run even though the cache is private to this process (it warms nothing the web processes read)'
+        )
+
+    def handle(self, *args, **options):
+        backend = self.process_local_backend()
+        if backend and not options['allow_local_cache']:
+            raise CommandError(
+                f"The page cache ({backend}) is private to this process, so there is nothing to warm. "
+                "Set CACHE_URL to a shared cache such as rediscache:// or pymemcache://."
+            )
+        self.host = options['host'] or self.default_host()
+        self.local = threading.local()
+        jobs = [
+            (path, language_code)
+            for path in self.get_paths()
+            for language_code, _ in settings.LANGUAGES
+        ]
+
+        started = time.perf_counter()
+        workers = max(1, options['workers'])
+        if workers == 1:
+            results = [self.render_page(*job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self.render_page_in_thread, jobs))
+        total_ms = (time.perf_counter() - started) * 1000
+
+        failures = 0
+        for path, language_code, status, elapsed_ms in results:
+            line = f"{status}  {elapsed_ms:8.1f} ms  [{language_code}] {path}"
+            if status == 200:
+                self.stdout.write(line)
+            else:
+                failures += 1
+                self.stdout.write(self.style.WARNING(line))
+
+        summary = f'Warmed {len(results) - failures}/{len(results)} pages in {total_ms:.1f} ms'
+        if failures:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def process_local_backend(self):
+        """Class name of the cache backend pages are stored in, if it isn't shared between processes"""
+        backend = caches['default']
+        if isinstance(backend, TwoTierCache):
+            backend = backend.shared
+        if isinstance(backend, (LocMemCache, DummyCache)):
+            return type(backend).__name__
+        return None
+
+    def default_host(self):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0].lstrip('.') if hosts else 'localhost'
+
+    def get_paths(self):
+        """Collect home plus both URL forms of every active navigation item"""
+        paths = [reverse('home')]
+        for nav_id, url in NavigationItem.objects.filter(is_active=True).values_list('id', 'url'):
+            paths.append(reverse('navigation_page', args=[nav_id]))
+            if url:
+                try:
+                    paths.append(reverse('navigation_page_by_url', args=[url]))
+                except NoReverseMatch:
+                    # External links and anchors are not served by this site
+                    continue
+        return list(dict.fromkeys(paths))
+
+    def get_client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = Client(raise_request_exception=False)
+            self.local.client = client
+        return client
+
+    def render_page(self, path, language_code):
+        client = self.get_client()
+        started = time.perf_counter()
+        response = client.get(
+            path,
+            secure=settings.SECURE_SSL_REDIRECT,
+            headers={'Host': self.host, 'Accept-Language': language_code},
+            **{WARMUP_HEADER: get_warmup_token()},
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return path, language_code, response.status_code, elapsed_ms
+
+    def render_page_in_thread(self, job):
+        # The test client does not close connections after a request
+        try:
+            return self.render_page(*job)
+        finally:
+            connections.close_all()
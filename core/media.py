@@ -0,0 +1,214 @@
+"""
+Media serving and garbage collection for EthioSites CMS
+Files are served with validators and byte ranges (or handed to the web
+server); content-addressed files never change, so they get far-future
+immutable caching. Because several rows may share one file, files are only
+deleted by the garbage collector once nothing references them any more.
+"""
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import stat as statmod
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import models
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import HASHED_NAME_RE, is_content_addressed
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_MEDIA_URL_RE = re.compile(re.escape(settings.MEDIA_URL) + r'''([^"'\s()<>?#\\]+)''')
+
+
+def _parse_range(header, size):
+    """
+    Parse a single "bytes=" range into (start, end) inclusive. Returns None to
+    serve the whole file (no header, multiple ranges) and raises ValueError
+    when the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header or '')
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == '':
+        if end == '' or int(end) == 0:
+            raise ValueError(header)
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _media_etag(path, stat):
+    match = HASHED_NAME_RE.search(path)
+    if match:
+        # The name is the content hash, so the tag is strong
+        return '"%s"' % os.path.splitext(os.path.basename(path))[0]
+    return 'W/"%x-%x"' % (stat.st_size, int(stat.st_mtime))
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file with ETag/Last-Modified validation and single
+    byte-range (206) support so videos can seek. When MEDIA_OFFLOAD_HEADER is
+    set, only headers are produced and the web server sends the bytes.
+    Hashed names are cacheable forever.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media file not found")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("Media file not found")
+    if not statmod.S_ISREG(stat.st_mode):
+        raise Http404("Media file not found")
+
+    etag = _media_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        _patch_media_headers(not_modified, path)
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    offload_header = getattr(settings, 'MEDIA_OFFLOAD_HEADER', '')
+    if offload_header:
+        response = HttpResponse(content_type=content_type)
+        if offload_header.lower() == 'x-accel-redirect':
+            response[offload_header] = quote(settings.MEDIA_OFFLOAD_PREFIX.rstrip('/') + '/' + path)
+        else:
+            response[offload_header] = full_path
+    else:
+        size = stat.st_size
+        byte_range = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range or if_range == etag:
+            try:
+                byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        if byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, length), status=206, content_type=content_type
+            )
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    _patch_media_headers(response, path)
+    return response
+
+
+def _patch_media_headers(response, path):
+    if is_content_addressed(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+
+
+def _reference_fields(model):
+    file_fields, text_fields = [], []
+    for field in model._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            file_fields.append(field.attname)
+        elif isinstance(field, (models.TextField, models.JSONField)):
+            # Rich text, payloads and snapshots embed media URLs
+            text_fields.append(field.attname)
+    return file_fields, text_fields
+
+
+def count_media_references():
+    """
+    Count, per stored name, how many core rows reference it through a file
+    field or a media URL inside text. Published and older content snapshots
+    count too, so rolling back never points at deleted files.
+    """
+    counts = Counter()
+    for model in apps.get_app_config('core').get_models():
+        file_fields, text_fields = _reference_fields(model)
+        if not file_fields and not text_fields:
+            continue
+        rows = model._base_manager.values_list(*file_fields, *text_fields)
+        for row in rows.iterator(chunk_size=500):
+            names = {name for name in row[:len(file_fields)] if name}
+            for value in row[len(file_fields):]:
+                if value is None:
+                    continue
+                if not isinstance(value, str):
+                    value = json.dumps(value)
+                names.update(_MEDIA_URL_RE.findall(value.replace('\\/', '/')))
+            counts.update(names)
+    return counts
+
+
+def _walk(storage, path=''):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f"{path}/{name}" if path else name
+    for directory in directories:
+        yield from _walk(storage, f"{path}/{directory}" if path else directory)
+
+
+def find_orphaned_media(grace_period=timedelta(hours=24), storage=default_storage):
+    """
+    Content-addressed files nothing references. Files younger than the grace
+    period are kept, since an upload is stored before its row is saved.
+    Legacy (non-hashed) files are never reported.
+    """
+    if not storage.exists(''):
+        return []
+    counts = count_media_references()
+    cutoff = timezone.now() - grace_period
+    orphans = []
+    for name in _walk(storage):
+        if not is_content_addressed(name) or counts[name]:
+            continue
+        if storage.get_modified_time(name) > cutoff:
+            continue
+        orphans.append(name)
+    return orphans
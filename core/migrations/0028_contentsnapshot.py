@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_cardblock_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(help_text='Content hash identifying this snapshot', max_length=64, unique=True)),
+                ('data', models.TextField(help_text='Compact JSON of the content graph keyed by language')),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('is_published', models.BooleanField(db_index=True, default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Content Snapshot',
+                'verbose_name_plural': 'Content Snapshots',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_contentsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotTraffic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bot', models.CharField(help_text='Crawler family, e.g. googlebot or uptime', max_length=50)),
+                ('hits', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Bot Traffic',
+                'verbose_name_plural': 'Bot Traffic',
+                'ordering': ['-date', '-hits'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'bot'), name='unique_bot_traffic_per_day')],
+            },
+        ),
+    ]
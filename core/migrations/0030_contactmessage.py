@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_bottraffic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(blank=True, max_length=200)),
+                ('message', models.TextField()),
+                ('page', models.CharField(blank=True, help_text='Path of the page the message was sent from', max_length=200)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('delivery_attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Contact Message',
+                'verbose_name_plural': 'Contact Messages',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueVisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('item_type', models.CharField(choices=[('hero', 'Hero'), ('section', 'Section'), ('card', 'Card Block'), ('nav', 'Navigation Item')], max_length=10)),
+                ('item_id', models.PositiveBigIntegerField()),
+                ('registers', models.BinaryField(help_text='zlib-compressed HyperLogLog registers')),
+            ],
+            options={
+                'verbose_name': 'Unique Visitor Sketch',
+                'verbose_name_plural': 'Unique Visitor Sketches',
+                'constraints': [models.UniqueConstraint(fields=('item_type', 'item_id', 'date'), name='unique_visitor_sketch_per_day')],
+            },
+        ),
+    ]
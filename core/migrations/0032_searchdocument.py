@@ -0,0 +1,101 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:44
+
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table over core_searchdocument, kept in sync by triggers
+    """CREATE VIRTUAL TABLE core_search_fts USING fts5(
+        title, body, content='core_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    """CREATE TRIGGER core_searchdocument_ai AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER core_searchdocument_ad AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_search_fts(core_search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER core_searchdocument_au AFTER UPDATE OF title, body ON core_searchdocument BEGIN
+        INSERT INTO core_search_fts(core_search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO core_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS core_searchdocument_au',
+    'DROP TRIGGER IF EXISTS core_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS core_searchdocument_ai',
+    'DROP TABLE IF EXISTS core_search_fts',
+]
+# Must match the expression core.search queries with
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX core_searchdocument_fts ON core_searchdocument "
+    "USING GIN (to_tsvector('simple', title || ' ' || body))",
+]
+POSTGRESQL_BACKWARD = ['DROP INDEX IF EXISTS core_searchdocument_fts']
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def index_existing(apps, schema_editor):
+    """Index the content that already exists; signals keep the index current from here on"""
+    from core.search import INDEXED_FIELDS, _language_codes, _localized, _plain_text, _section_url
+
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    items = (
+        ('section', apps.get_model('core', 'Section').objects.all(), lambda section: section.is_active),
+        ('card', apps.get_model('core', 'CardBlock').objects.select_related('section'),
+         lambda card: card.is_active and card.section.is_active),
+    )
+    documents = []
+    for item_type, queryset, is_public in items:
+        title_field, body_field = INDEXED_FIELDS[item_type]
+        for instance in queryset.iterator():
+            section_id = instance.pk if item_type == 'section' else instance.section_id
+            documents.extend(
+                SearchDocument(
+                    item_type=item_type, item_id=instance.pk, language=language,
+                    title=_plain_text(_localized(instance, title_field, language)),
+                    body=_plain_text(_localized(instance, body_field, language)),
+                    url=_section_url(section_id), is_active=is_public(instance),
+                )
+                for language in _language_codes()
+            )
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+create_fulltext_index = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+drop_fulltext_index = _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_uniquevisitorsketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('section', 'Section'), ('card', 'Card Block')], max_length=10)),
+                ('item_id', models.PositiveBigIntegerField()),
+                ('language', models.CharField(max_length=10)),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+                ('url', models.CharField(help_text='Where the item is shown on the site', max_length=200)),
+                ('is_active', models.BooleanField(default=True, help_text='Whether the item is shown on the public site')),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'constraints': [models.UniqueConstraint(fields=('item_type', 'item_id', 'language'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:53
+
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+
+# (model, rich text field, whether its images load lazily)
+RICH_TEXT_FIELDS = [
+    ('Section', 'description', True),
+    ('CardBlock', 'text', True),
+    ('Hero', 'subtitle_description', False),
+]
+
+
+def render_existing(apps, schema_editor):
+    from core.rich_text import render_rich_text
+
+    languages = [code for code, _ in settings.LANGUAGES]
+    for model_name, field, lazy in RICH_TEXT_FIELDS:
+        model = apps.get_model('core', model_name)
+        targets = [f'{field}_rendered_{code}' for code in languages]
+        updated = []
+        for instance in model.objects.all().iterator():
+            for code in languages:
+                source = getattr(instance, f'{field}_{code}')
+                setattr(instance, f'{field}_rendered_{code}', render_rich_text(source, lazy=lazy))
+            updated.append(instance)
+        model.objects.bulk_update(updated, targets, batch_size=500)
+
+
+def render_snapshots(apps, schema_editor):
+    """Published snapshots predate the rendered columns the templates now read"""
+    from core.rich_text import render_rich_text
+
+    def render(node, field, lazy):
+        if node is not None and f'{field}_rendered' not in node:
+            node[f'{field}_rendered'] = render_rich_text(node.get(field) or '', lazy=lazy)
+
+    ContentSnapshot = apps.get_model('core', 'ContentSnapshot')
+    for snapshot in ContentSnapshot.objects.all().iterator():
+        graphs = json.loads(snapshot.data)
+        for graph in graphs.values():
+            render(graph['hero'], 'subtitle_description', False)
+            for section in graph['sections']:
+                render(section, 'description', True)
+                for card in section['card_block']:
+                    render(card, 'text', True)
+        # Same encoding as snapshots.build_snapshot_data; the version stays the snapshot's id
+        snapshot.data = json.dumps(graphs, separators=(',', ':'), sort_keys=True)
+        snapshot.save(update_fields=['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardblock',
+            name='text_rendered',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cardblock',
+            name='text_rendered_am',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='cardblock',
+            name='text_rendered_en',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='hero',
+            name='subtitle_description_rendered',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='hero',
+            name='subtitle_description_rendered_am',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='hero',
+            name='subtitle_description_rendered_en',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='description_rendered',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='description_rendered_am',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='description_rendered_en',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+        migrations.RunPython(render_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+# item_type: (model name, metrics), as in core.counters.COUNTED_MODELS
+COUNTED_MODELS = {
+    'hero': ('Hero', ('view_count', 'cta_click_count')),
+    'section': ('Section', ('view_count',)),
+    'card': ('CardBlock', ('click_count',)),
+    'nav': ('NavigationItem', ('click_count',)),
+}
+
+
+def seed_shards(apps, schema_editor):
+    """Give every item its shards, with the existing count in shard 0"""
+    CounterShard = apps.get_model('core', 'CounterShard')
+    for item_type, (model_name, metrics) in COUNTED_MODELS.items():
+        model = apps.get_model('core', model_name)
+        shards = []
+        for values in model.objects.values('pk', *metrics).iterator():
+            shards.extend(
+                CounterShard(
+                    item_type=item_type, item_id=values['pk'], metric=metric, shard=shard,
+                    count=values[metric] if shard == 0 else 0,
+                )
+                for metric in metrics for shard in range(settings.COUNTER_SHARDS)
+            )
+        CounterShard.objects.bulk_create(shards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_rendered_rich_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('hero', 'Hero'), ('section', 'Section'), ('card', 'Card Block'), ('nav', 'Navigation Item')], max_length=10)),
+                ('item_id', models.PositiveBigIntegerField()),
+                ('metric', models.CharField(choices=[('view_count', 'Views'), ('click_count', 'Clicks'), ('cta_click_count', 'CTA Clicks')], max_length=20)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Counter Shard',
+                'verbose_name_plural': 'Counter Shards',
+                'constraints': [models.UniqueConstraint(fields=('item_type', 'item_id', 'metric', 'shard'), name='unique_counter_shard')],
+            },
+        ),
+        migrations.RunPython(seed_shards, migrations.RunPython.noop),
+    ]
@@ -5,12 +5,30 @@ from django_ckeditor_5.fields import CKEditor5Field
 from django.db import models as django_models
 from colorfield.fields import ColorField
 
+from .rich_text import render_instance_fields
+
 
 ICON_NAME_VALIDATOR = RegexValidator(
     r'^[a-z0-9-]+$', 
     'Enter a valid Lucide icon name (e.g. rocket-launch, heart-pulse).'
 )
 
+
+def _annotated_or_count(instance, name, related_manager):
+    """Use a count annotated by the admin queryset, falling back to a COUNT query"""
+    value = getattr(instance, name, None)
+    return value if value is not None else related_manager.count()
+
+
+class RenderedRichTextMixin:
+    """Keeps the <field>_rendered columns of rich_text_fields in step with the editor HTML"""
+    rich_text_fields = ()
+    lazy_rich_text_images = True
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = render_instance_fields(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
 class SiteSettings(models.Model):
     site_name = models.CharField(max_length=100, default="Ethiotech Leader")
     logo_text = models.CharField(max_length=50, blank=True, help_text="e.g., [Logo] or leave blank")
@@ -55,13 +73,14 @@ class NavigationItem(models.Model):
             'is_active': self.is_active,
             'is_dropdown': self.is_dropdown,
             'is_button': self.is_button,
+            'dropdown_item_count': _annotated_or_count(self, 'dropdown_item_count', self.dropdown_items),
             'click_count': self.click_count
         }
 
     def increment_click_count(self):
-        """Increment the click count for this navigation item"""
-        self.click_count += 1
-        self.save(update_fields=['click_count'])
+        """Increment the click count for this navigation item; returns the new total"""
+        from .counters import increment_and_get
+        return increment_and_get('nav', 'click_count', self.pk)
 
 class DropdownItem(models.Model):
     parent = models.ForeignKey(NavigationItem, related_name='dropdown_items', on_delete=models.CASCADE)
@@ -75,7 +94,7 @@ class DropdownItem(models.Model):
     def __str__(self):
         return str(self.label)
 
-class Section(models.Model):
+class Section(RenderedRichTextMixin, models.Model):
     """Content section within a business website."""
     # site_settings = models.ForeignKey(
     #     SiteSettings,
@@ -88,6 +107,7 @@ class Section(models.Model):
         help_text="Descriptive name for this content section"
     )
     description = django_models.TextField(blank=True, help_text="Description of this content section")
+    description_rendered = django_models.TextField(blank=True, editable=False)
     rows = models.PositiveIntegerField(default=1)
     columns = models.PositiveIntegerField(default=3)
     card_gap = models.CharField(max_length=20, default="1.5rem")
@@ -136,6 +156,8 @@ class Section(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    rich_text_fields = ('description',)
+
     class Meta:
         verbose_name = "Section"
         verbose_name_plural = "Sections"
@@ -150,16 +172,16 @@ class Section(models.Model):
             'title': self.name,
             'type': self.get_section_type_display(),
             'is_active': self.is_active,
-            'card_count': self.card_block.count(),
+            'card_count': _annotated_or_count(self, 'card_count', self.card_block),
             'view_count': self.view_count
         }
 
     def increment_view_count(self):
-        """Increment the view count for this section"""
-        self.view_count += 1
-        self.save(update_fields=['view_count'])
+        """Increment the view count for this section; returns the new total"""
+        from .counters import increment_and_get
+        return increment_and_get('section', 'view_count', self.pk)
 
-class CardBlock(models.Model):
+class CardBlock(RenderedRichTextMixin, models.Model):
     """Individual content card within a section."""
     section = models.ForeignKey(Section, related_name='card_block', on_delete=models.CASCADE)
 
@@ -171,6 +193,7 @@ class CardBlock(models.Model):
         blank=True, 
         help_text="Rich text content for the card"
     )
+    text_rendered = django_models.TextField(blank=True, editable=False)
     icon = models.CharField(
         max_length=60,
         # validators=[ICON_NAME_VALIDATOR],
@@ -235,6 +258,8 @@ class CardBlock(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    rich_text_fields = ('text',)
+
     class Meta:
         verbose_name = "Card Block"
         verbose_name_plural = "Card Blocks"
@@ -255,9 +280,9 @@ class CardBlock(models.Model):
         }
 
     def increment_click_count(self):
-        """Increment the click count for this card's CTA"""
-        self.click_count += 1
-        self.save(update_fields=['click_count'])
+        """Increment the click count for this card's CTA; returns the new total"""
+        from .counters import increment_and_get
+        return increment_and_get('card', 'click_count', self.pk)
 
     def get_payload_value(self, key, default=None):
         if not self.payload:
@@ -273,7 +298,7 @@ class CardBlock(models.Model):
     def has_type_specific_data(self):
         return bool(self.payload)
 
-class Hero(models.Model):
+class Hero(RenderedRichTextMixin, models.Model):
     """Hero section with rotating text and background images."""
     title = models.CharField(
         max_length=200,
@@ -283,6 +308,7 @@ class Hero(models.Model):
         blank=True,
         help_text="Supporting text. Rich text editor enabled."
     )
+    subtitle_description_rendered = django_models.TextField(blank=True, editable=False)
     cta_text = models.CharField(
         max_length=100,
         blank=True,
@@ -327,6 +353,10 @@ class Hero(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    rich_text_fields = ('subtitle_description',)
+    # The hero is above the fold, so its images load right away
+    lazy_rich_text_images = False
+
     class Meta:
         verbose_name = "Hero Section"
         verbose_name_plural = "Hero Sections"
@@ -341,21 +371,21 @@ class Hero(models.Model):
             'title': self.title,
             'layout_type': self.get_layout_type_display(),
             'is_active': self.is_active,
-            'rotating_text_count': self.rotating_texts.count(),
-            'background_image_count': self.background_images.count(),
+            'rotating_text_count': _annotated_or_count(self, 'rotating_text_count', self.rotating_texts),
+            'background_image_count': _annotated_or_count(self, 'background_image_count', self.background_images),
             'view_count': self.view_count,
             'cta_click_count': self.cta_click_count
         }
 
     def increment_view_count(self):
-        """Increment the view count for this hero section"""
-        self.view_count += 1
-        self.save(update_fields=['view_count'])
+        """Increment the view count for this hero section; returns the new total"""
+        from .counters import increment_and_get
+        return increment_and_get('hero', 'view_count', self.pk)
 
     def increment_cta_click_count(self):
-        """Increment the CTA click count for this hero section"""
-        self.cta_click_count += 1
-        self.save(update_fields=['cta_click_count'])
+        """Increment the CTA click count for this hero section; returns the new total"""
+        from .counters import increment_and_get
+        return increment_and_get('hero', 'cta_click_count', self.pk)
 
 class RotatingTextItem(models.Model):
     """Individual text string to be rotated in the Hero section."""
@@ -426,3 +456,141 @@ class Footer(models.Model):
         site_settings = SiteSettings.objects.filter(is_active=True).first()
         site_name = site_settings.site_name if site_settings else "Website"
         return f"Footer for {site_name}"
+
+
+class ContentSnapshot(models.Model):
+    """Immutable, versioned bundle of the published content graph"""
+    version = models.CharField(max_length=64, unique=True, help_text="Content hash identifying this snapshot")
+    data = models.TextField(help_text="Compact JSON of the content graph keyed by language")
+    note = models.CharField(max_length=200, blank=True)
+    is_published = models.BooleanField(default=False, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Content Snapshot"
+        verbose_name_plural = "Content Snapshots"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Snapshot {self.version}"
+
+
+class BotTraffic(models.Model):
+    """Daily page views from crawlers and monitors, kept out of the content counters"""
+    date = models.DateField()
+    bot = models.CharField(max_length=50, help_text="Crawler family, e.g. googlebot or uptime")
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Bot Traffic"
+        verbose_name_plural = "Bot Traffic"
+        ordering = ['-date', '-hits']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'bot'], name='unique_bot_traffic_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.bot} on {self.date}: {self.hits}"
+
+
+class ContactMessage(models.Model):
+    """Message sent through a contact form section; emailed in the background"""
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    subject = models.CharField(max_length=200, blank=True)
+    message = models.TextField()
+    page = models.CharField(max_length=200, blank=True, help_text="Path of the page the message was sent from")
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    delivery_attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Contact Message"
+        verbose_name_plural = "Contact Messages"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} <{self.email}>: {self.subject or self.message[:50]}"
+
+
+class UniqueVisitorSketch(models.Model):
+    """HyperLogLog sketch of the distinct visitors of one item on one day"""
+    ITEM_TYPES = [
+        ('hero', 'Hero'),
+        ('section', 'Section'),
+        ('card', 'Card Block'),
+        ('nav', 'Navigation Item'),
+    ]
+
+    date = models.DateField()
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPES)
+    item_id = models.PositiveBigIntegerField()
+    registers = models.BinaryField(help_text="zlib-compressed HyperLogLog registers")
+
+    class Meta:
+        verbose_name = "Unique Visitor Sketch"
+        verbose_name_plural = "Unique Visitor Sketches"
+        constraints = [
+            models.UniqueConstraint(fields=['item_type', 'item_id', 'date'], name='unique_visitor_sketch_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_item_type_display()} {self.item_id} on {self.date}"
+
+
+class CounterShard(models.Model):
+    """One of COUNTER_SHARDS rows whose sum is an item's view or click count (see core.counters)"""
+    ITEM_TYPES = UniqueVisitorSketch.ITEM_TYPES
+    METRICS = [
+        ('view_count', 'Views'),
+        ('click_count', 'Clicks'),
+        ('cta_click_count', 'CTA Clicks'),
+    ]
+
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPES)
+    item_id = models.PositiveBigIntegerField()
+    metric = models.CharField(max_length=20, choices=METRICS)
+    shard = models.PositiveSmallIntegerField()
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Counter Shard"
+        verbose_name_plural = "Counter Shards"
+        constraints = [
+            models.UniqueConstraint(fields=['item_type', 'item_id', 'metric', 'shard'], name='unique_counter_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_item_type_display()} {self.item_id} {self.metric} #{self.shard}"
+
+
+class SearchDocument(models.Model):
+    """
+    Plain-text copy of a section or card in one language, maintained by
+    core.search and indexed by SQLite FTS5 or a PostgreSQL GIN index
+    """
+    ITEM_TYPES = [
+        ('section', 'Section'),
+        ('card', 'Card Block'),
+    ]
+
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPES)
+    item_id = models.PositiveBigIntegerField()
+    language = models.CharField(max_length=10)
+    title = models.TextField()
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=200, help_text="Where the item is shown on the site")
+    is_active = models.BooleanField(default=True, help_text="Whether the item is shown on the public site")
+
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+        constraints = [
+            models.UniqueConstraint(fields=['item_type', 'item_id', 'language'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_item_type_display()} {self.item_id} ({self.language})"
@@ -0,0 +1,120 @@
+"""
+Pre-compressed page cache for EthioSites CMS
+Rendered public pages are stored once as identity, gzip and (when the brotli
+package is installed) brotli bodies. Cache hits pick a body by Accept-Encoding
+and send it as-is, so no compression work is done per request. Entries are
+served stale-while-revalidate (core.stale_cache): after PAGE_CACHE_SECONDS or
+a content change, one request re-renders the page while the rest keep getting
+the previous version for up to PAGE_CACHE_STALE_SECONDS.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import stale_cache
+from .db_router import mark_content_written
+
+try:
+    import brotli
+except ImportError:  # optional: pages are still served gzip-compressed
+    brotli = None
+
+GENERATION_KEY = 'core:page-cache:generation'
+# Bodies smaller than this don't gain enough to be worth a Content-Encoding
+MIN_COMPRESS_SIZE = 200
+
+_ACCEPT_ENCODING_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def get_generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def bump_generation():
+    """Invalidate every cached page by moving to a new key generation"""
+    # Re-renders must not pick up content from a lagging replica
+    mark_content_written()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def _is_language_query(query):
+    # ?lang=<code> only picks the language, which is part of the cache key
+    return list(query) == ['lang'] and query['lang'] in {code for code, _ in settings.LANGUAGES}
+
+
+def is_cacheable(request):
+    # Any other query string may change the rendered page
+    return (
+        settings.PAGE_CACHE_SECONDS > 0
+        and request.method in ('GET', 'HEAD')
+        and (not request.GET or _is_language_query(request.GET))
+    )
+
+
+def get_cache_key(request, language, content_version=None):
+    # The generation isn't part of the key, so pages from before a content change can still be served stale
+    return 'core:page:%s:%s:%s:%s' % (
+        content_version or 'live', request.get_host(), language, request.path,
+    )
+
+
+def compress_variants(body):
+    """Encoded bodies keyed by content-coding, 'identity' always present"""
+    variants = {'identity': body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+    return variants
+
+
+def store_page(found, response, track=None):
+    """Cache a rendered 200 response with its compressed variants; found is get_page()'s lookup"""
+    entry = {
+        'content_type': response['Content-Type'],
+        'variants': compress_variants(response.content),
+        'track': track or {},
+    }
+    stale_cache.store(found, entry, settings.PAGE_CACHE_SECONDS, settings.PAGE_CACHE_STALE_SECONDS)
+    return entry
+
+
+def get_page(key):
+    """
+    stale_cache.Lookup for a page: serve .value unless .regenerate is set, in
+    which case render the page and pass the lookup to store_page()
+    (or to stale_cache.release() when the page isn't stored).
+    """
+    return stale_cache.lookup('page', key, get_generation())
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Pick the best available coding for an Accept-Encoding header (br > gzip > identity)"""
+    weights = {}
+    for coding, quality in _ACCEPT_ENCODING_RE.findall(accept_encoding or ''):
+        try:
+            weights[coding.lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+    default = weights.get('*', 0.0)
+    for coding in ('br', 'gzip'):
+        if coding in available and weights.get(coding, default) > 0:
+            return coding
+    return 'identity'
+
+
+def build_response(request, entry):
+    coding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), entry['variants'])
+    response = HttpResponse(entry['variants'][coding], content_type=entry['content_type'])
+    if coding != 'identity':
+        response['Content-Encoding'] = coding
+    response['Content-Length'] = str(len(response.content))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,84 @@
+"""
+Public read path querysets for EthioSites CMS
+The public templates only need the active language's translation columns
+(plus the fallback language modeltranslation reads when a translation is
+empty) and never read the analytics, timestamp or admin-only layout fields,
+so live-content queries load just the columns a page renders.
+"""
+from functools import lru_cache
+
+from django.db.models import Prefetch
+from django.utils import translation
+from modeltranslation.fields import TranslationField
+from modeltranslation.translator import NotRegistered, translator
+from modeltranslation.utils import build_localized_fieldname, resolution_order
+
+from .models import (
+    CardBlock, DropdownItem, Footer, Hero, HeroBackgroundImage, NavigationItem,
+    RotatingTextItem, Section, SiteSettings
+)
+
+# Fields no public template reads. Ordering happens in SQL, so 'order' isn't needed either;
+# foreign keys stay because prefetching joins on them. Rich text is read from its
+# pre-rendered *_rendered columns instead of the editor HTML.
+UNRENDERED_FIELDS = {
+    SiteSettings: set(),
+    NavigationItem: {'order', 'click_count', 'created_at', 'updated_at'},
+    DropdownItem: {'order'},
+    Section: {
+        'description', 'rows', 'vertical_alignment', 'horizontal_alignment', 'title_font_size', 'order',
+        'view_count', 'created_at', 'updated_at',
+    },
+    CardBlock: {'text', 'order', 'click_count', 'created_at', 'updated_at'},
+    Hero: {'subtitle_description', 'order', 'view_count', 'cta_click_count', 'created_at', 'updated_at'},
+    RotatingTextItem: {'order'},
+    HeroBackgroundImage: {'order'},
+    Footer: set(),
+}
+
+
+@lru_cache(maxsize=None)
+def get_public_fields(model, language):
+    """Column names a public page needs from model when rendering in language"""
+    try:
+        translated = translator.get_options_for_model(model).all_fields
+    except NotRegistered:
+        translated = {}
+    fields = []
+    for field in model._meta.concrete_fields:
+        if isinstance(field, TranslationField) or field.name in UNRENDERED_FIELDS[model]:
+            continue
+        if field.name in translated:
+            languages = resolution_order(language, getattr(model, field.name).fallback_languages)
+            fields.extend(build_localized_fieldname(field.name, code) for code in languages)
+        else:
+            fields.append(field.name)
+    return tuple(fields)
+
+
+def public_only(queryset):
+    """Restrict a queryset to the columns rendered in the active language"""
+    return queryset.only(*get_public_fields(queryset.model, translation.get_language()))
+
+
+def public_objects(model):
+    return public_only(model.objects.all())
+
+
+def public_heroes():
+    return public_objects(Hero).prefetch_related(
+        Prefetch('rotating_texts', queryset=public_objects(RotatingTextItem)),
+        Prefetch('background_images', queryset=public_objects(HeroBackgroundImage)),
+    )
+
+
+def public_sections():
+    return public_objects(Section).prefetch_related(
+        Prefetch('card_block', queryset=public_objects(CardBlock)),
+    )
+
+
+def public_navigation_items():
+    return public_objects(NavigationItem).prefetch_related(
+        Prefetch('dropdown_items', queryset=public_objects(DropdownItem)),
+    )
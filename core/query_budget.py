@@ -0,0 +1,137 @@
+"""
+Query budgets for EthioSites CMS
+A budget caps how many SQL queries a block of code may run. Tests use it to
+fail on N+1 regressions; with QUERY_BUDGET_MODE = 'log' the public views log
+a warning with the SQL of every query when a request goes over budget. Stacks
+are expensive to capture, so they're only collected for the next run of a
+budget that went over, which then logs them too.
+"""
+import logging
+import traceback
+from contextlib import ContextDecorator
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Worst case for live (unpublished) content including the session read; the
+# session save happens in middleware, outside the view
+QUERY_BUDGETS = {
+    'home': 13,
+    'navigation_page': 8,
+    'navigation_page_by_url': 8,
+    # Lookup, shard UPDATE and the shard sum when the cached total has expired
+    'track_card_click': 3,
+    'track_hero_cta_click': 3,
+    'track_section_cta_click': 3,
+    # The INSERT, or the page that shows an invalid form again without JavaScript
+    'contact_submit': 4,
+    'search': 8,
+}
+
+_PROJECT_ROOT = str(Path(settings.BASE_DIR))
+
+# Names of the budgets whose next run captures stacks (per process)
+_trace_next = set()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _project_stack():
+    """Stack frames from this project only, innermost last"""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_PROJECT_ROOT) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith('query_budget.py')
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class query_budget(ContextDecorator):
+    """
+    Count queries on every database connection and enforce a maximum.
+    on_exceed='raise' raises QueryBudgetExceeded (for tests) with the SQL and
+    stack of each query; 'log' logs a warning with the SQL, and with the
+    stacks too when the previous run of the same budget went over.
+
+        with query_budget(5):
+            ...
+
+        @query_budget(QUERY_BUDGETS['home'], name='home')
+        def view(request): ...
+    """
+
+    def __init__(self, limit, name=None, on_exceed='raise', using=None):
+        self.limit = limit
+        self.name = name or 'block'
+        self.on_exceed = on_exceed
+        self.using = using
+        self.queries = []
+        self.stacks = False
+
+    def _record(self, execute, sql, params, many, context):
+        self.queries.append((sql, _project_stack() if self.stacks else ''))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.queries = []
+        self.stacks = self.on_exceed != 'log' or self.name in _trace_next
+        aliases = [self.using] if self.using else list(connections)
+        self._wrappers = [connections[alias].execute_wrapper(self._record) for alias in aliases]
+        for wrapper in self._wrappers:
+            wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        for wrapper in reversed(self._wrappers):
+            wrapper.__exit__(exc_type, exc_value, tb)
+        if exc_type is None and self.count > self.limit:
+            self.exceeded()
+        return False
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def report(self):
+        lines = [f"{self.name} ran {self.count} queries (budget {self.limit})"]
+        for index, (sql, stack) in enumerate(self.queries, start=1):
+            lines.append(f"{index}. {sql}")
+            if stack:
+                lines.append(stack.rstrip())
+        return '\n'.join(lines)
+
+    def exceeded(self):
+        if self.on_exceed == 'log':
+            if self.stacks:
+                _trace_next.discard(self.name)
+                logger.warning("Query budget exceeded: %s", self.report())
+            else:
+                _trace_next.add(self.name)
+                logger.warning("Query budget exceeded (stacks on the next run): %s", self.report())
+        else:
+            raise QueryBudgetExceeded(self.report())
+
+
+def view_query_budget(name):
+    """
+    Apply the QUERY_BUDGETS entry for a view according to QUERY_BUDGET_MODE:
+    '' (default, no overhead), 'log' or 'raise'.
+    """
+    limit = QUERY_BUDGETS[name]
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            mode = getattr(settings, 'QUERY_BUDGET_MODE', '')
+            if not mode:
+                return view_func(request, *args, **kwargs)
+            with query_budget(limit, name=name, on_exceed=mode):
+                return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
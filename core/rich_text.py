@@ -0,0 +1,316 @@
+"""
+Rich text rendering for EthioSites CMS
+Editor HTML (card text, section descriptions, hero subtitles) is cleaned once,
+when it is saved: sanitized against an allowlist, minified, and images
+uploaded through the editor are given intrinsic sizes, a srcset of resized
+variants and lazy loading. The result is stored per language in the
+<field>_rendered columns, which templates output as is.
+"""
+import logging
+import os
+import posixpath
+import re
+from html import escape
+from html.parser import HTMLParser
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from modeltranslation.utils import build_localized_fieldname
+from PIL import Image
+
+from .storage import CustomStorage
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'col', 'colgroup', 'del', 'div', 'em',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'iframe', 'img',
+    'input', 'label', 'li', 'mark', 'oembed', 'ol', 'p', 'pre', 's', 'small', 'span', 'strong',
+    'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+# Removed together with everything inside them; other unknown tags are unwrapped
+DROPPED_TAGS = {'script', 'style', 'template', 'noscript', 'object', 'embed', 'svg', 'math', 'textarea', 'select'}
+VOID_TAGS = {'br', 'col', 'hr', 'img', 'input'}
+BLOCK_TAGS = (
+    'blockquote', 'br', 'caption', 'col', 'colgroup', 'div', 'figcaption', 'figure', 'h[1-6]', 'hr',
+    'li', 'ol', 'p', 'pre', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul',
+)
+
+GLOBAL_ATTRIBUTES = {'class', 'style', 'title', 'dir', 'lang'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'target', 'rel'},
+    'col': {'span'},
+    'colgroup': {'span'},
+    'div': {'data-oembed-url'},
+    'iframe': {'src', 'allow', 'allowfullscreen', 'width', 'height'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'input': {'type', 'checked', 'disabled'},
+    'oembed': {'url'},
+    'ol': {'start', 'reversed', 'type'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ul': {'type'},
+}
+URL_ATTRIBUTES = {'href', 'src', 'url', 'data-oembed-url'}
+ALLOWED_SCHEMES = {'http', 'https', 'mailto', 'tel'}
+# Media embeds may only frame these players
+EMBED_HOSTS = {
+    'www.youtube.com', 'youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com',
+}
+ALLOWED_STYLES = {
+    'background-color', 'border', 'border-collapse', 'border-color', 'border-style', 'border-width',
+    'color', 'float', 'font-family', 'font-size', 'font-style', 'font-weight', 'height', 'list-style-type',
+    'margin-left', 'margin-right', 'max-width', 'padding', 'text-align', 'text-decoration',
+    'vertical-align', 'width',
+}
+_UNSAFE_STYLE_RE = re.compile(r'url\s*\(|expression|javascript|[\\<>@]|/\*', re.IGNORECASE)
+_SCHEME_RE = re.compile(r'^([a-z][a-z0-9+.-]*):', re.IGNORECASE)
+_CONTROL_RE = re.compile(r'[\x00-\x20\x7f]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+_BLOCK_SPACE_RE = re.compile(r'\s*(</?(?:%s)\b[^>]*>)\s*' % '|'.join(BLOCK_TAGS))
+# Sanitized <pre> blocks; the text inside them is escaped, so it can't contain </pre>
+_PRE_BLOCK_RE = re.compile(r'(<pre\b[^>]*>.*?</pre>)', re.DOTALL)
+
+# Widths of the resized copies offered in srcset; only those narrower than the upload are made
+RESPONSIVE_WIDTHS = (480, 960, 1600)
+RESPONSIVE_SIZES = '(min-width: 1024px) 50vw, 100vw'
+RESPONSIVE_DIRECTORY = 'responsive'
+JPEG_QUALITY = 85
+
+
+def _clean_url(value):
+    value = _CONTROL_RE.sub('', value or '')
+    match = _SCHEME_RE.match(value)
+    if match and match.group(1).lower() not in ALLOWED_SCHEMES:
+        return None
+    return value
+
+
+def _clean_style(value):
+    declarations = []
+    for declaration in value.split(';'):
+        name, _, css = declaration.partition(':')
+        name, css = name.strip().lower(), css.strip()
+        if name in ALLOWED_STYLES and css and not _UNSAFE_STYLE_RE.search(css):
+            declarations.append(f'{name}:{css}')
+    return ';'.join(declarations)
+
+
+def _is_embed(src):
+    parts = urlsplit(src or '')
+    return parts.scheme == 'https' and parts.hostname in EMBED_HOSTS
+
+
+def clean_attributes(tag, attrs):
+    """Allowed attributes of a tag as an ordered dict, with URLs and styles checked"""
+    allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+    cleaned = {}
+    for name, value in attrs:
+        name = name.lower()
+        if name not in allowed or name in cleaned:
+            continue
+        value = value or ''
+        if name in URL_ATTRIBUTES:
+            value = _clean_url(value)
+            if value is None:
+                continue
+        elif name == 'style':
+            value = _clean_style(value)
+            if not value:
+                continue
+        cleaned[name] = value
+    if tag == 'a' and cleaned.get('target') == '_blank':
+        rel = set(cleaned.get('rel', '').split()) | {'noopener', 'noreferrer'}
+        cleaned['rel'] = ' '.join(sorted(rel))
+    return cleaned
+
+
+# --- Images ---
+
+def _upload_prefix():
+    return settings.MEDIA_URL + 'uploads/'
+
+
+def _resize(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def build_variants(name, storage=None):
+    """
+    (width, height, [(url, width)]) for an uploaded image, storing resized
+    copies next to it, or None when the file can't be read as an image.
+    """
+    storage = storage or CustomStorage()
+    try:
+        with storage.open(name) as source:
+            image = Image.open(source)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning("Can't build responsive images for %s: %s", name, exc)
+        return None
+
+    variants = []
+    # Animated GIFs would lose their frames
+    if image.format in ('JPEG', 'PNG', 'WEBP'):
+        extension = os.path.splitext(name)[1].lower()
+        for width in RESPONSIVE_WIDTHS:
+            if width >= image.width:
+                break
+            data = _encode(_resize(image, width), image.format)
+            stored = storage.save(posixpath.join(RESPONSIVE_DIRECTORY, f'variant{extension}'), ContentFile(data))
+            variants.append((storage.url(stored), width))
+    return image.width, image.height, variants
+
+
+def get_variants(name):
+    """build_variants, cached: uploads are content-addressed, so a name always has the same bytes"""
+    key = f'core:rich_text:variants:{name}'
+    variants = cache.get(key)
+    if variants is None:
+        variants = build_variants(name)
+        # Failures (e.g. the file isn't stored yet) are retried on the next save
+        if variants is not None:
+            cache.set(key, variants, None)
+    return variants
+
+
+def responsive_image_attributes(attrs, lazy=True):
+    """Add sizes, srcset and loading hints to an <img>'s cleaned attributes"""
+    src = attrs.get('src', '')
+    prefix = _upload_prefix()
+    if src.startswith(prefix):
+        name = urlsplit(src[len(prefix):]).path
+        variants = get_variants(name)
+        if variants:
+            width, height, resized = variants
+            if 'width' not in attrs and 'height' not in attrs:
+                attrs['width'], attrs['height'] = str(width), str(height)
+            if resized:
+                candidates = [f'{url} {size}w' for url, size in resized] + [f'{src} {width}w']
+                attrs['srcset'] = ', '.join(candidates)
+                attrs['sizes'] = RESPONSIVE_SIZES
+    attrs['loading'] = 'lazy' if lazy else 'eager'
+    attrs['decoding'] = 'async'
+    return attrs
+
+
+# --- Sanitizer ---
+
+class RichTextRenderer(HTMLParser):
+    """Streams editor HTML into sanitized, whitespace-collapsed markup"""
+
+    def __init__(self, lazy=True):
+        super().__init__(convert_charrefs=True)
+        self.lazy = lazy
+        self.output = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropping or tag in DROPPED_TAGS:
+            if tag not in VOID_TAGS:
+                self.dropping += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        attrs = clean_attributes(tag, attrs)
+        if tag == 'iframe':
+            if not _is_embed(attrs.get('src')):
+                self.dropping += 1
+                return
+            attrs['loading'] = 'lazy' if self.lazy else 'eager'
+        elif tag == 'img':
+            if not attrs.get('src'):
+                return
+            attrs = responsive_image_attributes(attrs, self.lazy)
+        elif tag == 'input' and attrs.get('type') != 'checkbox':
+            return
+        self.output.append(f'<{tag}%s>' % ''.join(
+            f' {name}' if value == '' and name in ('allowfullscreen', 'checked', 'disabled', 'reversed')
+            else f' {name}="{escape(value)}"'
+            for name, value in attrs.items()
+        ))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            # A stray end tag can only end the drop early; what follows is still sanitized
+            self.dropping -= 1
+            return
+        if tag not in self.open_tags:
+            return
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        if 'pre' not in self.open_tags:
+            data = _WHITESPACE_RE.sub(' ', data)
+        self.output.append(escape(data, quote=False))
+
+    def render(self, html):
+        self.feed(html)
+        self.close()
+        self.output.extend(f'</{tag}>' for tag in reversed(self.open_tags))
+        self.open_tags = []
+        # Whitespace next to block boundaries never renders, except inside <pre>
+        parts = _PRE_BLOCK_RE.split(''.join(self.output))
+        return ''.join(
+            part if index % 2 else _BLOCK_SPACE_RE.sub(r'\1', part) for index, part in enumerate(parts)
+        ).strip()
+
+
+def render_rich_text(html, lazy=True):
+    """Sanitized, minified HTML with responsive images; lazy=False for content above the fold"""
+    if not html or not html.strip():
+        return ''
+    return RichTextRenderer(lazy=lazy).render(html)
+
+
+def rendered_field_name(field):
+    return f'{field}_rendered'
+
+
+def render_instance_fields(instance, update_fields=None):
+    """
+    Render each of instance.rich_text_fields into its <field>_rendered
+    columns for every language. With update_fields, only fields being saved
+    are rendered; returns update_fields extended with the rendered columns.
+    """
+    languages = [code for code, _ in settings.LANGUAGES]
+    saved = set(update_fields) if update_fields is not None else None
+    rendered = []
+    for field in instance.rich_text_fields:
+        if saved is not None and not saved & {field, *(build_localized_fieldname(field, code) for code in languages)}:
+            continue
+        for code in languages:
+            target = build_localized_fieldname(rendered_field_name(field), code)
+            source = getattr(instance, build_localized_fieldname(field, code))
+            setattr(instance, target, render_rich_text(source, lazy=instance.lazy_rich_text_images))
+            rendered.append(target)
+    if update_fields is None:
+        return None
+    return [*update_fields, *(name for name in rendered if name not in saved)]
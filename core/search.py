@@ -0,0 +1,245 @@
+"""
+Site search for EthioSites CMS
+Sections and cards are copied as plain text into one SearchDocument per
+language (kept in sync by signals in core.signals). SQLite matches them with
+an FTS5 table, PostgreSQL with a GIN index on a 'simple' tsvector; both use
+prefix queries, which work for Ethiopic where words carry affixes and
+stemmers don't exist. Other databases fall back to icontains.
+"""
+import re
+from html import unescape
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from modeltranslation.utils import build_localized_fieldname
+
+from .models import CardBlock, SearchDocument, Section
+
+MAX_TERMS = 8
+SNIPPET_LENGTH = 160
+
+# Letters, digits and combining marks; Ethiopic wordspace (፡) and full stop (።) separate terms
+_TERM_RE = re.compile(r'\w+')
+# item type: (title field, body field)
+INDEXED_FIELDS = {
+    'section': ('name', 'description'),
+    'card': ('title', 'text'),
+}
+
+
+def _language_codes():
+    return [code for code, _ in settings.LANGUAGES]
+
+
+def _plain_text(value):
+    return ' '.join(unescape(strip_tags(value or '')).split())
+
+
+def _localized(instance, field, language):
+    # Same fallback as the public pages: an empty translation shows the default language
+    value = getattr(instance, build_localized_fieldname(field, language), '')
+    if not value and language != settings.LANGUAGE_CODE:
+        value = getattr(instance, build_localized_fieldname(field, settings.LANGUAGE_CODE), '')
+    return value or ''
+
+
+def _section_url(section_id):
+    return f"{reverse('home')}#section-{section_id}"
+
+
+def build_documents(item_type, instance, is_active, url):
+    title_field, body_field = INDEXED_FIELDS[item_type]
+    return [
+        SearchDocument(
+            item_type=item_type, item_id=instance.pk, language=language,
+            title=_plain_text(_localized(instance, title_field, language)),
+            body=_plain_text(_localized(instance, body_field, language)),
+            url=url, is_active=is_active,
+        )
+        for language in _language_codes()
+    ]
+
+
+def _write_documents(documents):
+    """Insert or update one item's documents, skipping unchanged ones"""
+    first = documents[0]
+    existing = {
+        document.language: document
+        for document in SearchDocument.objects.filter(item_type=first.item_type, item_id=first.item_id)
+    }
+    for document in documents:
+        current = existing.get(document.language)
+        if current is None:
+            document.save()
+            continue
+        changed = [
+            field for field in ('title', 'body', 'url', 'is_active')
+            if getattr(current, field) != getattr(document, field)
+        ]
+        if changed:
+            document.pk = current.pk
+            document.save(update_fields=changed)
+
+
+def index_section(section):
+    with transaction.atomic():
+        _write_documents(build_documents('section', section, section.is_active, _section_url(section.pk)))
+        # A card is public only while its section is
+        SearchDocument.objects.filter(
+            item_type='card',
+            item_id__in=CardBlock.objects.filter(section=section, is_active=True).values('pk'),
+        ).exclude(is_active=section.is_active).update(is_active=section.is_active)
+
+
+def index_card(card):
+    section = card.section
+    _write_documents(build_documents(
+        'card', card, card.is_active and section.is_active, _section_url(section.pk),
+    ))
+
+
+def index_new_items(sections=(), cards=()):
+    """Index items created with bulk_create (which sends no signals); cards need .section loaded"""
+    documents = []
+    for section in sections:
+        documents.extend(build_documents('section', section, section.is_active, _section_url(section.pk)))
+    for card in cards:
+        documents.extend(build_documents(
+            'card', card, card.is_active and card.section.is_active, _section_url(card.section_id),
+        ))
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+def remove_from_index(item_type, item_id):
+    SearchDocument.objects.filter(item_type=item_type, item_id=item_id).delete()
+
+
+def rebuild_index():
+    """Recreate every document; returns how many were written"""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        index_new_items(
+            Section.objects.all().iterator(),
+            CardBlock.objects.select_related('section').iterator(),
+        )
+        return SearchDocument.objects.count()
+
+
+# --- Queries ---
+
+def parse_terms(query):
+    return [term.lower() for term in _TERM_RE.findall(query or '')][:MAX_TERMS]
+
+
+def _filters(language, item_type, public):
+    clauses, params = [], []
+    if language:
+        clauses.append('d.language = %s')
+        params.append(language)
+    if item_type:
+        clauses.append('d.item_type = %s')
+        params.append(item_type)
+    if public:
+        clauses.append('d.is_active')
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+def _sqlite_ids(terms, filters, params, limit):
+    # Terms only contain word characters, so quoting them is enough; every term must match as a prefix
+    match = ' '.join(f'"{term}"*' for term in terms)
+    sql = (
+        'SELECT d.id FROM core_search_fts JOIN core_searchdocument d ON d.id = core_search_fts.rowid '
+        f'WHERE core_search_fts MATCH %s{filters} '
+        'ORDER BY bm25(core_search_fts, 10.0, 1.0)'
+    )
+    return _fetch_ids(sql, [match, *params], limit)
+
+
+def _postgresql_ids(terms, filters, params, limit):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    vector = "to_tsvector('simple', d.title || ' ' || d.body)"
+    sql = (
+        f"SELECT d.id FROM core_searchdocument d WHERE {vector} @@ to_tsquery('simple', %s){filters} "
+        f"ORDER BY ts_rank({vector}, to_tsquery('simple', %s)) DESC"
+    )
+    return _fetch_ids(sql, [tsquery, *params, tsquery], limit)
+
+
+def _fetch_ids(sql, params, limit):
+    if limit:
+        sql += ' LIMIT %s'
+        params = [*params, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, language, item_type, public, limit):
+    documents = SearchDocument.objects.all()
+    if language:
+        documents = documents.filter(language=language)
+    if item_type:
+        documents = documents.filter(item_type=item_type)
+    if public:
+        documents = documents.filter(is_active=True)
+    for term in terms:
+        documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    ids = documents.values_list('id', flat=True)
+    return list(ids[:limit] if limit else ids)
+
+
+def search_document_ids(query, language=None, item_type=None, public=False, limit=None):
+    """Ids of matching SearchDocuments, best match first"""
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    filters, params = _filters(language, item_type, public)
+    if connection.vendor == 'sqlite':
+        return _sqlite_ids(terms, filters, params, limit)
+    if connection.vendor == 'postgresql':
+        return _postgresql_ids(terms, filters, params, limit)
+    return _fallback_ids(terms, language, item_type, public, limit)
+
+
+def search_public(query, language, limit=None):
+    """Public search: active sections and cards in one language, best match first"""
+    if language not in _language_codes():
+        language = settings.LANGUAGE_CODE
+    ids = search_document_ids(query, language=language, public=True, limit=limit)
+    documents = SearchDocument.objects.in_bulk(ids)
+    terms = parse_terms(query)
+    results = []
+    for pk in ids:
+        document = documents[pk]
+        document.snippet = make_snippet(document.body, terms)
+        results.append(document)
+    return results
+
+
+def search_item_ids(query, item_type):
+    """Admin search: ids of the items matching in any language, active or not"""
+    ids = search_document_ids(query, item_type=item_type)
+    return set(SearchDocument.objects.filter(pk__in=ids).values_list('item_id', flat=True))
+
+
+def make_snippet(text, terms, length=SNIPPET_LENGTH):
+    """Escaped excerpt around the first matching term, with matches wrapped in <mark>"""
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(term) for term in terms) if position >= 0]
+    start = max(0, min(positions) - length // 4) if positions else 0
+    excerpt = text[start:start + length]
+    parts, end = [], 0
+    if terms:
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        for match in pattern.finditer(excerpt):
+            parts.append(f'{escape(excerpt[end:match.start()])}<mark>{escape(match.group(0))}</mark>')
+            end = match.end()
+    parts.append(escape(excerpt[end:]))
+    snippet = ''.join(parts)
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + length < len(text) else ''
+    return mark_safe(f'{prefix}{snippet}{suffix}')
@@ -0,0 +1,96 @@
+"""
+Model signal handlers for EthioSites CMS
+Connected in CoreConfig.ready().
+"""
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, page_cache, search, sitemaps
+from .bots import flush_bot_traffic_if_due
+from .models import (
+    CardBlock, DropdownItem, Footer, Hero, HeroBackgroundImage, NavigationItem,
+    RotatingTextItem, Section, SiteSettings
+)
+from .stale_cache import flush_metrics_if_due
+from .video import schedule_poster
+from .visitors import flush_visitor_sketches_if_due
+
+PAGE_CONTENT_MODELS = (
+    SiteSettings, NavigationItem, DropdownItem, Section, CardBlock,
+    Hero, RotatingTextItem, HeroBackgroundImage, Footer,
+)
+# Saves touching only these don't change what pages render
+COUNTER_FIELDS = {'view_count', 'click_count', 'cta_click_count'}
+
+
+def _counters_only(update_fields):
+    return bool(update_fields) and set(update_fields) <= COUNTER_FIELDS
+
+
+def content_changed(sender, update_fields=None, **kwargs):
+    if _counters_only(update_fields):
+        return
+    # After commit, so a concurrent re-render can't cache the old rows under the new generation
+    transaction.on_commit(page_cache.bump_generation)
+
+
+# Models whose changes show in the sitemap (menu URLs and the home page lastmod)
+SITEMAP_MODELS = (NavigationItem, DropdownItem, Hero, Section, CardBlock)
+
+
+def sitemap_content_changed(sender, update_fields=None, **kwargs):
+    if not _counters_only(update_fields):
+        transaction.on_commit(sitemaps.bump_generation)
+
+
+for model in SITEMAP_MODELS:
+    post_save.connect(sitemap_content_changed, sender=model, dispatch_uid=f'sitemap_{model.__name__}_save')
+    post_delete.connect(sitemap_content_changed, sender=model, dispatch_uid=f'sitemap_{model.__name__}_delete')
+
+for model in PAGE_CONTENT_MODELS:
+    post_save.connect(content_changed, sender=model, dispatch_uid=f'page_cache_{model.__name__}_save')
+    post_delete.connect(content_changed, sender=model, dispatch_uid=f'page_cache_{model.__name__}_delete')
+
+
+@receiver(post_save, sender=CardBlock)
+def card_block_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    schedule_poster(instance)
+    if not _counters_only(update_fields):
+        search.index_card(instance)
+
+
+@receiver(post_save, sender=Section)
+def section_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and not _counters_only(update_fields):
+        search.index_section(instance)
+
+
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=CardBlock)
+def searchable_deleted(sender, instance, **kwargs):
+    search.remove_from_index('section' if sender is Section else 'card', instance.pk)
+
+
+def counted_item_saved(sender, instance, created=False, raw=False, **kwargs):
+    # Shards exist up front, so counting a view is a single UPDATE
+    if created and not raw:
+        counters.create_shards(counters.ITEM_TYPES[sender], [instance.pk])
+
+
+def counted_item_deleted(sender, instance, **kwargs):
+    counters.delete_shards(counters.ITEM_TYPES[sender], instance.pk)
+
+
+for model in counters.ITEM_TYPES:
+    post_save.connect(counted_item_saved, sender=model, dispatch_uid=f'counters_{model.__name__}_save')
+    post_delete.connect(counted_item_deleted, sender=model, dispatch_uid=f'counters_{model.__name__}_delete')
+
+
+request_finished.connect(flush_bot_traffic_if_due, dispatch_uid='flush_bot_traffic')
+request_finished.connect(flush_visitor_sketches_if_due, dispatch_uid='flush_visitor_sketches')
+request_finished.connect(flush_metrics_if_due, dispatch_uid='flush_cache_metrics')
+request_finished.connect(counters.materialize_counters_if_due, dispatch_uid='materialize_counters')
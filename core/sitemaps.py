@@ -0,0 +1,146 @@
+"""
+XML sitemaps for EthioSites CMS
+The home page and every navigation page reachable from the menu are listed
+with lastmod and en/am hreflang alternates: the plain URL for the default
+language, ?lang= for the others (cached pages like the plain URL). The
+rendered index and sitemap files are cached per host until navigation or
+home page content changes, and served with ETag and Last-Modified
+validators. After a change the previous files keep being served
+while one request rebuilds them (core.stale_cache).
+"""
+import hashlib
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve, reverse
+
+from . import stale_cache
+from .models import CardBlock, Hero, NavigationItem, Section
+
+GENERATION_KEY = 'core:sitemap:generation'
+# The protocol allows 50,000 URLs per file
+SITEMAP_PAGE_SIZE = 5000
+
+
+def get_generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def _internal_path(url, nav_urls):
+    """Site path a menu URL points at, or None for anchors, external links and unknown pages"""
+    url = (url or '').strip()
+    if not url or url.startswith('#'):
+        return None
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc:
+        return None
+    path = '/' + parts.path.strip('/')
+    if path != '/':
+        path += '/'
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    if match.url_name == 'home':
+        return path
+    if match.url_name == 'navigation_page_by_url' and match.kwargs['nav_url'] in nav_urls:
+        return path
+    return None
+
+
+def _home_lastmod():
+    dates = [
+        model.objects.filter(is_active=True).aggregate(lastmod=Max('updated_at'))['lastmod']
+        for model in (Hero, Section, CardBlock)
+    ]
+    dates = [date for date in dates if date]
+    return max(dates) if dates else None
+
+
+def get_locations():
+    """[(path, lastmod)] for the home page and the active navigation pages, menu order"""
+    nav_items = list(NavigationItem.objects.filter(is_active=True).prefetch_related('dropdown_items').order_by('order'))
+    nav_urls = {item.url for item in nav_items}
+    content_lastmod = _home_lastmod()
+    lastmods = {reverse('home'): content_lastmod}
+
+    def add(path, lastmod):
+        # Navigation pages render every section too
+        if content_lastmod and (not lastmod or content_lastmod > lastmod):
+            lastmod = content_lastmod
+        if path not in lastmods or (lastmod and (not lastmods[path] or lastmod > lastmods[path])):
+            lastmods[path] = lastmod
+
+    for item in nav_items:
+        url = item.url.strip()
+        path = _internal_path(url, nav_urls)
+        if path is None and not url.startswith('#') and not urlsplit(url).netloc:
+            # Items without a routable URL still have a page by id; anchors are skipped
+            path = reverse('navigation_page', args=[item.pk])
+        if path:
+            add(path, item.updated_at)
+        for dropdown_item in item.dropdown_items.all():
+            path = _internal_path(dropdown_item.url, nav_urls)
+            if path:
+                add(path, item.updated_at)
+    return list(lastmods.items())
+
+
+def _alternates(location):
+    # The default language is the plain URL, which is also x-default
+    alternates = [
+        {'hreflang': code, 'href': location if code == settings.LANGUAGE_CODE else f'{location}?lang={code}'}
+        for code, _ in settings.LANGUAGES
+    ]
+    alternates.append({'hreflang': 'x-default', 'href': location})
+    return alternates
+
+
+def build_sitemaps(base_url):
+    """
+    Render the sitemap index and its sitemaps for a base URL such as
+    https://example.com; returns {'index' or page number: (xml, lastmod)}.
+    """
+    locations = get_locations()
+    pages = [
+        locations[start:start + SITEMAP_PAGE_SIZE]
+        for start in range(0, len(locations), SITEMAP_PAGE_SIZE)
+    ] or [[]]
+
+    documents, index = {}, []
+    for number, page in enumerate(pages, start=1):
+        urls = [
+            {'location': base_url + path, 'lastmod': lastmod, 'alternates': _alternates(base_url + path)}
+            for path, lastmod in page
+        ]
+        lastmod = max((lastmod for _, lastmod in page if lastmod), default=None)
+        documents[number] = (render_to_string('sitemaps/urlset.xml', {'urls': urls}), lastmod)
+        index.append({'location': base_url + reverse('sitemap', args=[number]), 'lastmod': lastmod})
+    lastmod = max((entry['lastmod'] for entry in index if entry['lastmod']), default=None)
+    documents['index'] = (render_to_string('sitemaps/index.xml', {'sitemaps': index}), lastmod)
+    return documents
+
+
+def get_sitemap(request, page='index'):
+    """(xml, etag, lastmod) for a sitemap document, or None when the page doesn't exist"""
+    base_url = f'{request.scheme}://{request.get_host()}'
+
+    def build():
+        return {
+            name: (body, '"%s"' % hashlib.sha256(body.encode('utf-8')).hexdigest()[:32], lastmod)
+            for name, (body, lastmod) in build_sitemaps(base_url).items()
+        }
+
+    # Fresh until the generation moves on; crawlers get the previous files while one request rebuilds
+    documents = stale_cache.get_or_build('sitemap', f'core:sitemap:{base_url}', build, None, None, get_generation())
+    return documents.get(page)
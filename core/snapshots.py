@@ -0,0 +1,248 @@
+"""
+Content snapshots for EthioSites CMS
+Publishing serializes the active content graph for every language into one
+immutable JSON blob. Public views render from the in-memory copy of the
+published snapshot and only reload it when the published version changes.
+The published version is kept in the shared cache, so checking it costs no
+database query.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone, translation
+from modeltranslation.fields import TranslationField
+
+from .models import (
+    CardBlock, ContentSnapshot, Footer, Hero, NavigationItem, Section, SiteSettings
+)
+
+# Counters change on every request and are never rendered
+EXCLUDED_FIELDS = {'view_count', 'click_count', 'cta_click_count'}
+# Published version, '' when live content is served
+PUBLISHED_VERSION_KEY = 'core:snapshot:published-version'
+_UNKNOWN = object()
+
+
+class SnapshotNode(dict):
+    """Dict that also answers attribute lookups, so it reads like a model instance."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class SnapshotCard(SnapshotNode):
+    """Card node exposing the same payload helpers as CardBlock."""
+    get_payload_value = CardBlock.get_payload_value
+    get_payload_list = CardBlock.get_payload_list
+    has_type_specific_data = CardBlock.has_type_specific_data
+
+
+class SnapshotList(list):
+    """List standing in for a related manager or queryset in templates."""
+
+    def all(self):
+        return self
+
+    def count(self):
+        return len(self)
+
+    def first(self):
+        return self[0] if self else None
+
+
+def serialize_instance(instance):
+    """Serialize concrete fields of a model instance in the active language"""
+    data = {}
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, TranslationField) or field.name in EXCLUDED_FIELDS:
+            # The base field name already resolves to the active language
+            continue
+        if isinstance(field, models.FileField):
+            file = getattr(instance, field.name)
+            data[field.name] = {'url': file.url, 'name': file.name} if file else None
+        else:
+            data[field.attname] = getattr(instance, field.attname)
+    return data
+
+
+def build_content_graph():
+    """Build the public content graph for the active language"""
+    site_settings = SiteSettings.objects.filter(is_active=True).first()
+    hero = (
+        Hero.objects.filter(is_active=True)
+        .prefetch_related('rotating_texts', 'background_images')
+        .order_by('order')
+        .first()
+    )
+    sections = (
+        Section.objects.filter(is_active=True)
+        .prefetch_related(models.Prefetch(
+            'card_block', queryset=CardBlock.objects.filter(is_active=True).order_by('order')
+        ))
+        .order_by('order')
+    )
+    navigation_items = NavigationItem.objects.prefetch_related('dropdown_items').order_by('order')
+    footer = Footer.objects.filter(is_active=True).first()
+
+    hero_data = None
+    if hero:
+        hero_data = serialize_instance(hero)
+        hero_data['rotating_texts'] = [serialize_instance(item) for item in hero.rotating_texts.all()]
+        hero_data['background_images'] = [serialize_instance(item) for item in hero.background_images.all()]
+
+    section_data = []
+    for section in sections:
+        data = serialize_instance(section)
+        data['card_block'] = [serialize_instance(card) for card in section.card_block.all()]
+        section_data.append(data)
+
+    nav_data = []
+    for nav_item in navigation_items:
+        data = serialize_instance(nav_item)
+        data['dropdown_items'] = [serialize_instance(item) for item in nav_item.dropdown_items.all()]
+        nav_data.append(data)
+
+    return {
+        'site_settings': serialize_instance(site_settings) if site_settings else None,
+        'navigation_items': nav_data,
+        'hero': hero_data,
+        'sections': section_data,
+        'footer': serialize_instance(footer) if footer else None,
+    }
+
+
+def build_snapshot_data():
+    """Serialize the content graph for every configured language as compact JSON"""
+    graphs = {}
+    for language_code, _ in settings.LANGUAGES:
+        with translation.override(language_code):
+            graphs[language_code] = build_content_graph()
+    return json.dumps(graphs, cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=True)
+
+
+def publish_snapshot(note=''):
+    """
+    Snapshot the current content and make it the published version.
+    Publishing unchanged content reuses the existing snapshot row.
+    """
+    data = build_snapshot_data()
+    version = hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+    with transaction.atomic():
+        snapshot, _ = ContentSnapshot.objects.get_or_create(
+            version=version,
+            defaults={'data': data, 'note': note},
+        )
+        _mark_published(snapshot)
+    return snapshot
+
+
+def activate_snapshot(version):
+    """Publish a previously created snapshot, e.g. to roll back"""
+    with transaction.atomic():
+        snapshot = ContentSnapshot.objects.select_for_update().get(version=version)
+        _mark_published(snapshot)
+    return snapshot
+
+
+def unpublish_snapshots():
+    """Stop serving snapshots so public views read live content again"""
+    ContentSnapshot.objects.filter(is_published=True).update(is_published=False)
+    transaction.on_commit(lambda: _announce_published(''))
+
+
+def _mark_published(snapshot):
+    ContentSnapshot.objects.filter(is_published=True).exclude(pk=snapshot.pk).update(is_published=False)
+    snapshot.is_published = True
+    snapshot.published_at = timezone.now()
+    snapshot.save(update_fields=['is_published', 'published_at'])
+    transaction.on_commit(lambda: _announce_published(snapshot.version))
+
+
+def _announce_published(version):
+    """Tell every process which version is published, once the change is committed"""
+    cache.set(PUBLISHED_VERSION_KEY, version, None)
+    reset_loaded_snapshot()
+
+
+def _read_published_version():
+    version = cache.get(PUBLISHED_VERSION_KEY, _UNKNOWN)
+    if version is _UNKNOWN:
+        version = (
+            ContentSnapshot.objects.filter(is_published=True)
+            .values_list('version', flat=True)
+            .first()
+        ) or ''
+        # add(), so a publish announced meanwhile isn't overwritten
+        cache.add(PUBLISHED_VERSION_KEY, version, None)
+    return version or None
+
+
+# --- In-process snapshot cache ---
+
+_state_lock = threading.Lock()
+_state = {'version': None, 'graphs': {}, 'checked_at': None}
+
+
+def reset_loaded_snapshot():
+    """Forget the in-memory snapshot so the next lookup re-reads the version"""
+    with _state_lock:
+        _state.update(version=None, graphs={}, checked_at=None)
+
+
+def _hydrate(graph):
+    for key in ('navigation_items', 'sections'):
+        graph[key] = SnapshotList(graph[key])
+    for nav_item in graph['navigation_items']:
+        nav_item['dropdown_items'] = SnapshotList(nav_item['dropdown_items'])
+    for section in graph['sections']:
+        section['card_block'] = SnapshotList(SnapshotCard(card) for card in section['card_block'])
+    if graph['hero']:
+        graph['hero']['rotating_texts'] = SnapshotList(graph['hero']['rotating_texts'])
+        graph['hero']['background_images'] = SnapshotList(graph['hero']['background_images'])
+    return graph
+
+
+def _load(version):
+    data = ContentSnapshot.objects.filter(version=version).values_list('data', flat=True).first()
+    if data is None:
+        return {}
+    graphs = json.loads(data, object_hook=SnapshotNode)
+    return {language: _hydrate(graph) for language, graph in graphs.items()}
+
+
+def get_published_version():
+    """Version of the snapshot loaded by the last get_published_content() call"""
+    return _state['version']
+
+
+def get_published_content(language=None):
+    """
+    Return the published content graph for a language, or None when no
+    snapshot is published. The published version is re-checked at most
+    every CONTENT_SNAPSHOT_RECHECK_SECONDS.
+    """
+    recheck = getattr(settings, 'CONTENT_SNAPSHOT_RECHECK_SECONDS', 0)
+    now = time.monotonic()
+    checked_at = _state['checked_at']
+    if checked_at is None or now - checked_at >= recheck:
+        version = _read_published_version()
+        graphs = _load(version) if version and version != _state['version'] else None
+        with _state_lock:
+            if version != _state['version']:
+                _state.update(version=version, graphs=graphs or {})
+            _state['checked_at'] = now
+
+    graphs = _state['graphs']
+    if not graphs:
+        return None
+    language = language or translation.get_language()
+    return graphs.get(language) or graphs.get(settings.LANGUAGE_CODE)
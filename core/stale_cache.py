@@ -0,0 +1,173 @@
+"""
+Stale-while-revalidate caching for EthioSites CMS
+Entries remember when they stop being fresh (the soft TTL) and which content
+generation they were built from. Once an entry goes stale, through age or a
+content change, the first worker to take a short lock in the shared cache
+rebuilds it. Other workers keep serving the stale copy meanwhile. Entries are
+only dropped at the hard TTL. TTLs get random jitter so entries written
+together don't expire together. Hit, stale-serve and regeneration counts and
+regeneration times are counted in memory and added to the shared cache after
+responses have been sent, for `manage.py cache_metrics`.
+"""
+import random
+import threading
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+METRIC_NAMES = ('hits', 'stale_serves', 'misses', 'regenerations', 'regeneration_ms')
+# Caches reporting metrics
+CACHE_NAMES = ('page', 'navigation', 'site-settings', 'sitemap')
+METRICS_FLUSH_SECONDS = 10
+
+# found: whether an entry exists; regenerate: whether the caller should rebuild it;
+# generation: the content generation at lookup time, which a rebuilt entry is stamped with
+Lookup = namedtuple('Lookup', 'name key value found regenerate started generation')
+
+
+def _lock_key(key):
+    # Outside the entry's key prefix, so a two-tier cache never holds locks in process memory
+    return f'core:regenerating:{key}'
+
+
+def _metric_key(name, metric):
+    return f'core:stale-cache:metrics:{name}:{metric}'
+
+
+def jittered(seconds):
+    """seconds spread by ±CACHE_TTL_JITTER (a fraction); None stays None"""
+    if seconds is None:
+        return None
+    spread = settings.CACHE_TTL_JITTER
+    return max(1, round(seconds * (1 + random.uniform(-spread, spread))))
+
+
+_metrics_lock = threading.Lock()
+_pending_metrics = Counter()
+_last_flush = time.monotonic()
+
+
+def record_metric(name, metric, amount=1):
+    # Counted in memory, so serving from the cache costs no extra shared-cache writes
+    with _metrics_lock:
+        _pending_metrics[name, metric] += amount
+
+
+def flush_metrics_if_due(**kwargs):
+    """request_finished handler: flush once METRICS_FLUSH_SECONDS have passed"""
+    global _last_flush
+    with _metrics_lock:
+        if not _pending_metrics or time.monotonic() - _last_flush < METRICS_FLUSH_SECONDS:
+            return
+        _last_flush = time.monotonic()
+    flush_metrics()
+
+
+def flush_metrics():
+    """Add this process's counts to the shared totals"""
+    global _pending_metrics
+    with _metrics_lock:
+        pending, _pending_metrics = _pending_metrics, Counter()
+    for (name, metric), amount in pending.items():
+        key = _metric_key(name, metric)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            if not cache.add(key, amount, None):
+                cache.incr(key, amount)
+
+
+def get_metrics():
+    """{cache name: {metric: value}} including the mean regeneration time in ms"""
+    flush_metrics()
+    metrics = {}
+    for name in CACHE_NAMES:
+        values = cache.get_many([_metric_key(name, metric) for metric in METRIC_NAMES])
+        data = {metric: values.get(_metric_key(name, metric), 0) for metric in METRIC_NAMES}
+        data['mean_regeneration_ms'] = (
+            round(data['regeneration_ms'] / data['regenerations'], 1) if data['regenerations'] else 0
+        )
+        metrics[name] = data
+    return metrics
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _pending_metrics.clear()
+    cache.delete_many([_metric_key(name, metric) for name in CACHE_NAMES for metric in METRIC_NAMES])
+
+
+def _is_fresh(entry, generation):
+    if generation is not None and entry['generation'] != generation:
+        return False
+    return entry['fresh_until'] is None or time.time() < entry['fresh_until']
+
+
+def lookup(name, key, generation=None):
+    """
+    Find an entry. A fresh entry is served as is. A stale one is served too,
+    unless this caller won the regeneration lock, in which case it should
+    rebuild the entry and store() it.
+    """
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, generation):
+        record_metric(name, 'hits')
+        return Lookup(name, key, entry['value'], True, False, None, generation)
+
+    won = cache.add(_lock_key(key), 1, settings.CACHE_REGENERATION_LOCK_SECONDS)
+    if entry is None:
+        # Nothing to serve, so the caller builds it either way
+        record_metric(name, 'misses')
+        return Lookup(name, key, None, False, True, time.perf_counter() if won else None, generation)
+    if not won:
+        record_metric(name, 'stale_serves')
+        return Lookup(name, key, entry['value'], True, False, None, generation)
+    return Lookup(name, key, entry['value'], True, True, time.perf_counter(), generation)
+
+
+def store(found, value, soft_seconds, stale_seconds):
+    """
+    Save a rebuilt entry, fresh for soft_seconds (None: until the generation
+    changes) and kept stale_seconds longer (None: no hard expiry). The entry
+    gets the generation seen by lookup(): content changed while rebuilding
+    leaves it stale, so the next request rebuilds it again.
+    """
+    fresh_for = jittered(soft_seconds)
+    entry = {
+        'value': value,
+        'generation': found.generation,
+        'fresh_until': time.time() + fresh_for if fresh_for is not None else None,
+    }
+    timeout = None if fresh_for is None or stale_seconds is None else fresh_for + jittered(stale_seconds)
+    cache.set(found.key, entry, timeout)
+    if found.started is not None:
+        record_metric(found.name, 'regenerations')
+        record_metric(found.name, 'regeneration_ms', round((time.perf_counter() - found.started) * 1000))
+    release(found)
+
+
+def release(found):
+    """Give up the regeneration lock (after storing, or when rebuilding failed)"""
+    if found.started is not None:
+        cache.delete(_lock_key(found.key))
+
+
+def discard(found):
+    """Drop an entry that can't be rebuilt any more (e.g. the page now 404s), and its lock"""
+    cache.delete_many([found.key, _lock_key(found.key)])
+
+
+def get_or_build(name, key, build, soft_seconds, stale_seconds, generation=None):
+    """Value from the cache, rebuilding it with build() when this caller should"""
+    found = lookup(name, key, generation)
+    if not found.regenerate:
+        return found.value
+    try:
+        value = build()
+    except BaseException:
+        release(found)
+        raise
+    store(found, value, soft_seconds, stale_seconds)
+    return value
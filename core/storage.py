@@ -1,8 +1,49 @@
 from django.core.files.storage import FileSystemStorage
+from django.core.files import File
 from django.conf import settings
+import hashlib
 import os
+import posixpath
+import re
 
-class CustomStorage(FileSystemStorage):
+# <upload dir>/<2 hex fan-out>/<sha256>.<ext>
+HASHED_NAME_RE = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[a-z0-9]+)?$')
+
+
+def is_content_addressed(name):
+    """True when a stored name was produced by ContentAddressedStorage"""
+    return bool(HASHED_NAME_RE.search(name or ''))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores uploads under the SHA-256 of their content, keeping the upload
+    directory and extension. Identical uploads share one file and a URL
+    always points at the same bytes, so it can be cached forever.
+    """
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        sha256 = digest.hexdigest()
+        directory = posixpath.dirname(name.replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, sha256[:2], f"{sha256}{extension}")
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        hashed_name = self.get_hashed_name(name, content)
+        if self.exists(hashed_name):
+            return hashed_name
+        return super().save(hashed_name, content, max_length=max_length)
+
+
+class CustomStorage(ContentAddressedStorage):
     """Custom storage for CKEditor 5 to handle file uploads properly"""
     
     def __init__(self, location=None, base_url=None):
@@ -10,4 +51,4 @@ class CustomStorage(FileSystemStorage):
             location = os.path.join(settings.MEDIA_ROOT, 'uploads')
         if base_url is None:
             base_url = os.path.join(settings.MEDIA_URL, 'uploads/')
-        super().__init__(location, base_url)
\ No newline at end of file
+        super().__init__(location, base_url)
@@ -0,0 +1,63 @@
+"""
+Template warm-up for EthioSites CMS
+Compiles the public page templates into the cached loader when a server
+process starts (ethiosites/wsgi.py and asgi.py), so forked workers share them.
+"""
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+from .section_registry import SECTION_TYPES
+
+logger = logging.getLogger(__name__)
+
+PAGE_TEMPLATES = (
+    'base.html',
+    'index.html',
+    'navigation_page.html',
+)
+
+
+def get_partial_template_names():
+    """Get the names of all templates under partials/ in the project template dirs"""
+    names = set()
+    for options in settings.TEMPLATES:
+        for template_dir in options.get('DIRS', []):
+            partials_dir = Path(template_dir) / 'partials'
+            for path in partials_dir.rglob('*.html'):
+                names.add(path.relative_to(template_dir).as_posix())
+    return sorted(names)
+
+
+def get_preload_template_names():
+    """Get every template the public pages can render, in load order"""
+    names = list(PAGE_TEMPLATES)
+    names.extend(info['template'] for info in SECTION_TYPES.values())
+    names.extend(get_partial_template_names())
+    return list(dict.fromkeys(names))
+
+
+def preload_templates(using='django'):
+    """
+    Compile the public templates into the cached loader.
+    Returns the names that were loaded; missing or broken templates are
+    logged and skipped so a bad template never blocks startup.
+    """
+    engine = engines[using]
+    loaded = []
+    for name in get_preload_template_names():
+        try:
+            engine.get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+            logger.warning("Could not preload template %s: %s", name, exc)
+            continue
+        loaded.append(name)
+    return loaded
+
+
+def preload_templates_on_startup():
+    """Server entry points: preload unless PRELOAD_TEMPLATES is off"""
+    if getattr(settings, 'PRELOAD_TEMPLATES', False):
+        preload_templates()
@@ -0,0 +1,22 @@
+# core/templatetags/asset_tags.py
+from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from core.assets import PAGE_LAYOUT, get_critical_css
+
+register = template.Library()
+
+
+@register.simple_tag
+def critical_css(hero=None):
+    """
+    Inline the critical CSS built for the hero's layout.
+    Usage: {% critical_css hero %}
+    """
+    layout = getattr(hero, 'layout_type', None) or PAGE_LAYOUT
+    css = get_critical_css(layout)
+    if not css:
+        return ''
+    return format_html('<style>{}</style>', mark_safe(css))
+
@@ -0,0 +1,21 @@
+# core/templatetags/section_tags.py
+from django import template
+
+from core.section_registry import get_section_template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def render_section(context, section):
+    """
+    Render a section with the template registered for its type.
+    Usage: {% render_section section %}
+
+    Templates are resolved through the engine, so the cached loader hands
+    back the already compiled Template and dispatch is a dict lookup.
+    """
+    template_name = get_section_template(section.section_type)
+    section_template = context.template.engine.get_template(template_name)
+    with context.push(section=section):
+        return section_template.render(context)
@@ -24,6 +24,7 @@ class SectionTranslationOptions(TranslationOptions):
     fields = (
         'name', 
         'description',
+        'description_rendered',
         'title_font_size',
         'cta_label'
     )
@@ -32,6 +33,7 @@ class CardBlockTranslationOptions(TranslationOptions):
     fields = (
         'title', 
         'text',
+        'text_rendered',
         'cta_label',
         'cta_url'
     )
@@ -40,6 +42,7 @@ class HeroTranslationOptions(TranslationOptions):
     fields = (
         'title', 
         'subtitle_description',
+        'subtitle_description_rendered',
         'cta_text'
     )
 
@@ -5,6 +5,10 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('page/<int:nav_id>/', views.navigation_page, name='navigation_page'),
+    path('sitemap.xml', views.sitemap, name='sitemap_index'),
+    path('sitemap-<int:page>.xml', views.sitemap, name='sitemap'),
+    path('search/', views.search, name='search'),
+    path('contact/submit/', views.contact_submit, name='contact_submit'),
     path('<slug:nav_url>/', views.navigation_page_by_url, name='navigation_page_by_url'),
     path('track/card-click/<int:card_id>/', views.track_card_click, name='track_card_click'),
     path('track/hero-cta-click/<int:hero_id>/', views.track_hero_cta_click, name='track_hero_cta_click'),
@@ -0,0 +1,123 @@
+"""
+Video posters for EthioSites CMS
+Cards with an uploaded video and no thumbnail get a poster frame extracted
+with ffmpeg in a background thread once the save has committed, so pages can
+show the poster without the browser fetching any video bytes.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import Q
+
+from . import page_cache, sitemaps
+from .models import CardBlock
+
+logger = logging.getLogger(__name__)
+
+POSTER_SEEK_SECONDS = 1
+POSTER_WIDTH = 1280
+FFMPEG_TIMEOUT_SECONDS = 120
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def needs_poster(card):
+    return bool(card.video_file) and not card.video_thumbnail
+
+
+def _run_ffmpeg(video_path, output_path, seek):
+    subprocess.run(
+        [
+            settings.FFMPEG_BINARY, '-nostdin', '-loglevel', 'error', '-y',
+            '-ss', str(seek), '-i', video_path,
+            '-frames:v', '1', '-vf', f'scale=min({POSTER_WIDTH}\\,iw):-2', '-q:v', '3',
+            output_path,
+        ],
+        check=True,
+        timeout=FFMPEG_TIMEOUT_SECONDS,
+        capture_output=True,
+    )
+
+
+def extract_poster(card):
+    """
+    Extract a poster frame for the card's video and store it as its
+    video_thumbnail. Returns the stored name, or None when nothing was done.
+    """
+    if not needs_poster(card):
+        return None
+    if not shutil.which(settings.FFMPEG_BINARY):
+        logger.warning("ffmpeg not found (%s); skipping poster for card %s", settings.FFMPEG_BINARY, card.pk)
+        return None
+
+    video_path = card.video_file.path
+    fd, output_path = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+    try:
+        # Clips shorter than the seek offset produce no frame, so fall back to the first one
+        for seek in (POSTER_SEEK_SECONDS, 0):
+            try:
+                _run_ffmpeg(video_path, output_path, seek)
+            except (OSError, subprocess.SubprocessError) as exc:
+                logger.warning("Poster extraction failed for card %s: %s", card.pk, exc)
+                return None
+            if os.path.getsize(output_path):
+                break
+        else:
+            return None
+
+        stem = os.path.splitext(os.path.basename(card.video_file.name))[0]
+        with open(output_path, 'rb') as poster:
+            card.video_thumbnail.save(f"{stem}.jpg", File(poster), save=False)
+    finally:
+        os.remove(output_path)
+
+    name = card.video_thumbnail.name
+    # Don't overwrite a thumbnail an editor uploaded meanwhile
+    updated = CardBlock.objects.filter(pk=card.pk).filter(
+        Q(video_thumbnail='') | Q(video_thumbnail__isnull=True)
+    ).update(video_thumbnail=name)
+    if not updated:
+        # Uploads are content-addressed, so another card may share the file
+        if not CardBlock.objects.filter(video_thumbnail=name).exists():
+            card.video_thumbnail.storage.delete(name)
+        return None
+    # update() sends no signals
+    transaction.on_commit(page_cache.bump_generation)
+    transaction.on_commit(sitemaps.bump_generation)
+    return name
+
+
+def _extract_in_thread(card_id):
+    try:
+        card = CardBlock.objects.filter(pk=card_id).first()
+        if card is not None:
+            extract_poster(card)
+    except Exception:
+        logger.exception("Poster extraction crashed for card %s", card_id)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='video-poster')
+        return _executor
+
+
+def schedule_poster(card):
+    """Queue poster extraction for after the current transaction commits"""
+    if needs_poster(card):
+        card_id = card.pk
+        transaction.on_commit(lambda: _get_executor().submit(_extract_in_thread, card_id))
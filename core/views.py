@@ -1,24 +1,69 @@
 # core/views.py
+from functools import wraps
+
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, get_object_or_404
 from django.utils import translation
-from django.views.decorators.http import require_POST
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import http_date, url_has_allowed_host_and_scheme
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
 
+from . import counters, page_cache, stale_cache
+from .bots import get_bot_family, record_bot_hit
+from .contact import HONEYPOT_FIELD, ContactForm, get_client_ip, get_contact_throttle, schedule_delivery
 from .models import CardBlock, Footer, Hero, NavigationItem, Section, SiteSettings
+from .public_queries import public_heroes, public_navigation_items, public_objects, public_sections
+from .query_budget import view_query_budget
+from .search import search_public
+from .sitemaps import get_sitemap
+from .snapshots import SnapshotList, get_published_content, get_published_version
+from .visitors import record_visit
 
 LANGUAGE_SESSION_KEY = 'django_language'
 SUPPORTED_LANGUAGE_CODES = {code for code, _ in settings.LANGUAGES}
+WARMUP_HEADER = 'HTTP_X_CACHE_WARMUP'
+SEARCH_QUERY_MAX_LENGTH = 100
+SEARCH_RESULTS_LIMIT = 30
+
+
+def get_warmup_token():
+    """Token sent by the warm_cache command so its renders are not counted"""
+    return salted_hmac('core.views.warmup', 'warm_cache').hexdigest()
+
+
+def _should_track(request):
+    """
+    Whether this page view counts. HEAD requests, cache warm-up renders and
+    bots don't; bot views go to the BotTraffic tally instead.
+    """
+    if request.method == 'HEAD':
+        return False
+    token = request.META.get(WARMUP_HEADER)
+    if token and constant_time_compare(token, get_warmup_token()):
+        return False
+    bot_family = get_bot_family(request)
+    if bot_family:
+        record_bot_hit(bot_family)
+        return False
+    return True
 
 
 def _apply_language_from_request(request):
     lang = request.GET.get('lang')
     if lang and lang in SUPPORTED_LANGUAGE_CODES:
         translation.activate(lang)
-        request.session[LANGUAGE_SESSION_KEY] = lang
-        # legacy support
-        request.session['_language'] = lang
         request.LANGUAGE_CODE = lang
+        # Remember the choice for people only: crawlers following the sitemap's
+        # hreflang URLs would otherwise get a session row per request
+        if get_bot_family(request):
+            return
+        if request.session.get(LANGUAGE_SESSION_KEY) != lang or request.session.get('_language') != lang:
+            request.session[LANGUAGE_SESSION_KEY] = lang
+            # legacy support
+            request.session['_language'] = lang
     else:
         legacy_lang = request.session.get('_language')
         session_lang = request.session.get(LANGUAGE_SESSION_KEY)
@@ -29,110 +74,345 @@ def _apply_language_from_request(request):
             request.LANGUAGE_CODE = chosen
 
 
+def _get_shared_content(name, build):
+    """
+    Content every page in the active language renders (the menu, the site
+    settings), cached like pages and rebuilt stale-while-revalidate
+    """
+    if settings.PAGE_CACHE_SECONDS <= 0:
+        return build()
+    return stale_cache.get_or_build(
+        name, f'core:{name}:{translation.get_language()}', build,
+        settings.PAGE_CACHE_SECONDS, settings.PAGE_CACHE_STALE_SECONDS, page_cache.get_generation(),
+    )
+
+
+def _get_site_settings():
+    site_settings = _get_shared_content(
+        'site-settings', lambda: public_objects(SiteSettings).filter(is_active=True).first(),
+    )
+    if site_settings is None:
+        raise Http404("No active site settings")
+    return site_settings
+
+
+def _get_navigation_items():
+    return _get_shared_content('navigation', lambda: list(public_navigation_items().order_by('order')))
+
+
+def _get_page_content(with_hero=True):
+    """Content shared by the public pages, from the published snapshot when there is one"""
+    content = get_published_content()
+    if content is not None:
+        if not content['site_settings']:
+            raise Http404("No active site settings in the published snapshot")
+        return dict(content)
+
+    # Only the columns the templates render, in the active language
+    return {
+        'site_settings': _get_site_settings(),
+        # Navigation pages don't render the hero
+        'hero': public_heroes().filter(is_active=True).order_by('order').first() if with_hero else None,
+        'sections': public_sections().filter(is_active=True).order_by('order'),
+        'navigation_items': _get_navigation_items(),
+        'footer': public_objects(Footer).filter(is_active=True).first(),
+    }
+
+
+def _increment_page_views(hero_id, section_ids):
+    # Ids come from model instances, snapshot nodes or a cached page; one UPDATE per model
+    if hero_id:
+        counters.increment('hero', 'view_count', [hero_id])
+    if section_ids:
+        counters.increment('section', 'view_count', section_ids)
+
+
+def _increment_nav_click(nav_id):
+    counters.increment('nav', 'click_count', [nav_id])
+
+
+def _track_page(request, track):
+    if 'nav_item' in track:
+        _increment_nav_click(track['nav_item'])
+        record_visit(request, 'nav', [track['nav_item']])
+    else:
+        _increment_page_views(track.get('hero'), track.get('sections'))
+        if track.get('hero'):
+            record_visit(request, 'hero', [track['hero']])
+        record_visit(request, 'section', track.get('sections'))
+
+
+def _track_click(request, item_type, item_id):
+    # Clicks are counted for everyone, unique visitors only for people
+    if not get_bot_family(request):
+        record_visit(request, item_type, [item_id])
+
+
+def _get_cached_page(request):
+    """
+    Return (cache lookup, cached response). The response is None when the page
+    must be rendered; the lookup is None when the page can't be cached.
+    """
+    if not page_cache.is_cacheable(request):
+        return None, None
+    get_published_content()  # refreshes which snapshot version is loaded
+    key = page_cache.get_cache_key(request, translation.get_language(), get_published_version())
+    found = page_cache.get_page(key)
+    if found.regenerate:
+        request.page_cache_lookup = found
+        return found, None
+    entry = found.value
+    if _should_track(request):
+        _track_page(request, entry['track'])
+    return found, page_cache.build_response(request, entry)
+
+
+def _cache_page(request, found, response, track):
+    """Store a freshly rendered page and answer with its negotiated encoding"""
+    if found is None:
+        return response
+    if response.status_code != 200:
+        stale_cache.discard(found)
+        return response
+    entry = page_cache.store_page(found, response, track)
+    return page_cache.build_response(request, entry)
+
+
+def discards_stale_page(view):
+    """
+    When a cached page now 404s, stop serving its stale copy. Other failures
+    (a database outage, a timeout) keep it, and the regeneration lock until
+    it expires, so other requests are answered stale meanwhile.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            found = getattr(request, 'page_cache_lookup', None)
+            if found is not None:
+                stale_cache.discard(found)
+            raise
+    return wrapper
+
+
+def _find_snapshot_item(items, **lookup):
+    for item in items:
+        if all(item.get(key) == value for key, value in lookup.items()):
+            return item
+    raise Http404("No navigation item matches the given query.")
+
+
+def _render_navigation_page(request, content, nav_item):
+    # Increment click count for navigation item
+    track = {'nav_item': nav_item.id}
+    if _should_track(request):
+        _track_page(request, track)
+
+    # Sections are not linked to navigation items yet, so every active section is passed
+    return track, render(request, 'navigation_page.html', {
+        'site_settings': content['site_settings'],
+        'nav_item': nav_item,
+        'navigation_items': content['navigation_items'],
+        'sections': content['sections'],
+        'footer': content['footer'],
+    })
+
+
+@view_query_budget('home')
+@discards_stale_page
 def home(request):
     _apply_language_from_request(request)
-    
-    settings = get_object_or_404(SiteSettings, is_active=True)
-    request.site_settings = settings          # attach for templates
-
-    hero = Hero.objects.filter(is_active=True).order_by('order').first()
-    sections = Section.objects.filter(is_active=True).order_by('order')
-    nav = NavigationItem.objects.prefetch_related('dropdown_items').order_by('order')
-    footer = Footer.objects.filter(is_active=True).first()
-    
-    # Increment view count for hero section
-    if hero:
-        hero.increment_view_count()
-    
-    # Increment view count for all sections
-    for section in sections:
-        section.increment_view_count()
-
-    return render(request, 'index.html', {
-        'site_settings': settings,
-        'hero': hero,
-        'sections': sections,
-        'navigation_items': nav,
-        'footer': footer,
+    found, cached = _get_cached_page(request)
+    if cached is not None:
+        return cached
+
+    content = _get_page_content()
+    request.site_settings = content['site_settings']          # attach for templates
+
+    track = {
+        'hero': content['hero'].id if content['hero'] else None,
+        'sections': [section.id for section in content['sections']],
+    }
+    if _should_track(request):
+        _track_page(request, track)
+
+    response = render(request, 'index.html', {
+        'site_settings': content['site_settings'],
+        'hero': content['hero'],
+        'sections': content['sections'],
+        'navigation_items': content['navigation_items'],
+        'footer': content['footer'],
     })
+    return _cache_page(request, found, response, track)
 
+@view_query_budget('navigation_page')
+@discards_stale_page
 def navigation_page(request, nav_id):
     _apply_language_from_request(request)
-    
-    settings = get_object_or_404(SiteSettings, is_active=True)
-    request.site_settings = settings
-    
+    found, cached = _get_cached_page(request)
+    if cached is not None:
+        return cached
+
+    content = _get_page_content(with_hero=False)
+    request.site_settings = content['site_settings']
+
     # Get the navigation item
-    nav_item = get_object_or_404(NavigationItem, id=nav_id)
-    
-    # Increment click count for navigation item
-    nav_item.increment_click_count()
-    
-    # Get all navigation items for the sidebar
-    nav = NavigationItem.objects.prefetch_related('dropdown_items').order_by('order')
-    
-    # Get sections related to this navigation item (you might want to add a foreign key relationship)
-    # For now, we'll get all sections
-    sections = Section.objects.filter(is_active=True).order_by('order')
-    
-    # Get footer
-    footer = Footer.objects.filter(is_active=True).first()
-    
-    return render(request, 'navigation_page.html', {
-        'site_settings': settings,
-        'nav_item': nav_item,
-        'navigation_items': nav,
-        'sections': sections,
-        'footer': footer,
-    })
+    if isinstance(content['navigation_items'], SnapshotList):
+        nav_item = _find_snapshot_item(content['navigation_items'], id=nav_id)
+    else:
+        nav_item = get_object_or_404(public_objects(NavigationItem), id=nav_id)
+
+    track, response = _render_navigation_page(request, content, nav_item)
+    return _cache_page(request, found, response, track)
 
+@view_query_budget('navigation_page_by_url')
+@discards_stale_page
 def navigation_page_by_url(request, nav_url):
     _apply_language_from_request(request)
-    
-    settings = get_object_or_404(SiteSettings, is_active=True)
-    request.site_settings = settings
-    
+    found, cached = _get_cached_page(request)
+    if cached is not None:
+        return cached
+
+    content = _get_page_content(with_hero=False)
+    request.site_settings = content['site_settings']
+
     # Get the navigation item by URL
-    nav_item = get_object_or_404(NavigationItem, url=nav_url)
-    
-    # Increment click count for navigation item
-    nav_item.increment_click_count()
-    
-    # Get all navigation items for the sidebar
-    nav = NavigationItem.objects.prefetch_related('dropdown_items').order_by('order')
-    
-    # Get sections related to this navigation item (you might want to add a foreign key relationship)
-    # For now, we'll get all sections
-    sections = Section.objects.filter(is_active=True).order_by('order')
-    
-    # Get footer
-    footer = Footer.objects.filter(is_active=True).first()
-    
-    return render(request, 'navigation_page.html', {
-        'site_settings': settings,
-        'nav_item': nav_item,
-        'navigation_items': nav,
-        'sections': sections,
-        'footer': footer,
+    if isinstance(content['navigation_items'], SnapshotList):
+        nav_item = _find_snapshot_item(content['navigation_items'], url=nav_url)
+    else:
+        nav_item = get_object_or_404(public_objects(NavigationItem), url=nav_url)
+
+    track, response = _render_navigation_page(request, content, nav_item)
+    return _cache_page(request, found, response, track)
+
+
+@view_query_budget('search')
+def search(request):
+    """Search active sections and cards in the current language"""
+    _apply_language_from_request(request)
+    content = _get_page_content(with_hero=False)
+    request.site_settings = content['site_settings']
+
+    query = request.GET.get('q', '').strip()[:SEARCH_QUERY_MAX_LENGTH]
+    results = search_public(query, translation.get_language(), limit=SEARCH_RESULTS_LIMIT) if query else []
+    return render(request, 'search.html', {
+        'site_settings': content['site_settings'],
+        'navigation_items': content['navigation_items'],
+        'footer': content['footer'],
+        'query': query,
+        'results': results,
     })
 
+
+@require_safe
+def sitemap(request, page='index'):
+    """Sitemap index (/sitemap.xml) and its numbered sitemaps, rendered once per content change"""
+    document = get_sitemap(request, page)
+    if document is None:
+        raise Http404("No such sitemap")
+    body, etag, lastmod = document
+    # HTTP dates have one-second precision
+    last_modified = int(lastmod.timestamp()) if lastmod else None
+    response = HttpResponse(body, content_type='application/xml; charset=utf-8')
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.SITEMAP_CACHE_SECONDS)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+
 @require_POST
+@view_query_budget('track_card_click')
 def track_card_click(request, card_id):
     """Track clicks on card CTAs"""
     card = get_object_or_404(CardBlock, id=card_id)
-    card.increment_click_count()
-    return JsonResponse({'success': True, 'click_count': card.click_count})
+    click_count = card.increment_click_count()
+    _track_click(request, 'card', card.id)
+    return JsonResponse({'success': True, 'click_count': click_count})
 
 @require_POST
+@view_query_budget('track_hero_cta_click')
 def track_hero_cta_click(request, hero_id):
     """Track clicks on hero section CTAs"""
     hero = get_object_or_404(Hero, id=hero_id)
-    hero.increment_cta_click_count()
-    return JsonResponse({'success': True, 'cta_click_count': hero.cta_click_count})
+    cta_click_count = hero.increment_cta_click_count()
+    _track_click(request, 'hero', hero.id)
+    return JsonResponse({'success': True, 'cta_click_count': cta_click_count})
 
 @require_POST
+@view_query_budget('track_section_cta_click')
 def track_section_cta_click(request, section_id):
     """Track clicks on section CTAs"""
     section = get_object_or_404(Section, id=section_id)
-    section.increment_view_count()
-    return JsonResponse({'success': True, 'view_count': section.view_count})
+    view_count = section.increment_view_count()
+    _track_click(request, 'section', section.id)
+    return JsonResponse({'success': True, 'view_count': view_count})
+
+
+def _is_xhr(request):
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+
+def _contact_response(request, page, status, payload):
+    # Plain form posts (no JavaScript) go back to the page they came from
+    if status == 201 and not _is_xhr(request):
+        if not url_has_allowed_host_and_scheme(page, {request.get_host()}, request.is_secure()):
+            page = '/'
+        return HttpResponseRedirect(f"{page}#contact")
+    return JsonResponse(payload, status=status)
+
+
+def _render_contact_errors(request, page, form):
+    """Without JavaScript an invalid form comes back on its own page, with its errors and values"""
+    _apply_language_from_request(request)
+    content = _get_page_content(with_hero=False)
+    request.site_settings = content['site_settings']
+    return render(request, 'contact.html', {
+        'site_settings': content['site_settings'],
+        'navigation_items': content['navigation_items'],
+        'footer': content['footer'],
+        'form': form,
+        'page': page,
+    }, status=400)
+
+
+# Public pages are served from the page cache without a CSRF token, so the form
+# can't carry one; the honeypot and per-IP throttle keep automated posts out
+@csrf_exempt
+@require_POST
+@view_query_budget('contact_submit')
+def contact_submit(request):
+    """Store a contact form message and queue its email"""
+    page = request.POST.get('page', '')[:200]
+    if not get_contact_throttle().consume(get_client_ip(request)):
+        error = 'Too many messages, please try again later.'
+        if not _is_xhr(request):
+            # No page render: throttled floods shouldn't reach the database
+            return HttpResponse(error, status=429, content_type='text/plain; charset=utf-8')
+        return JsonResponse({'success': False, 'error': error}, status=429)
+    if request.POST.get(HONEYPOT_FIELD):
+        # Look successful so spam bots don't adapt
+        return _contact_response(request, page, 201, {'success': True})
+
+    form = ContactForm(request.POST)
+    if not form.is_valid():
+        if not _is_xhr(request):
+            return _render_contact_errors(request, page, form)
+        return JsonResponse({'success': False, 'errors': form.errors.get_json_data()}, status=400)
+    message = form.save(commit=False)
+    message.page = page
+    message.ip_address = get_client_ip(request)
+    message.save()
+    schedule_delivery(message)
+    return _contact_response(request, page, 201, {'success': True})
+
+    form = ContactForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors.get_json_data()}, status=400)
+    message = form.save(commit=False)
+    message.page = page
+    message.ip_address = get_client_ip(request)
+    message.save()
+    schedule_delivery(message)
+    return _contact_response(request, page, 201, {'success': True})
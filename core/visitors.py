@@ -0,0 +1,154 @@
+"""
+Unique visitor estimates for EthioSites CMS
+Each item (hero, section, card, navigation item) gets one HyperLogLog sketch
+per day, fed with a keyed hash of the visitor's IP and user agent. Sketches
+are built in memory, merged into UniqueVisitorSketch rows after responses
+have been sent (register-wise max, so workers and days merge losslessly) and
+estimate distinct visitors within about 2%.
+"""
+import threading
+import time
+import zlib
+from datetime import timedelta
+from math import log
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import UniqueVisitorSketch
+
+PRECISION = 11
+REGISTER_COUNT = 1 << PRECISION
+_REST_BITS = 64 - PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTER_COUNT)
+
+
+class HyperLogLog:
+    """Dense HyperLogLog sketch over 64-bit hashes (2**PRECISION one-byte registers)"""
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTER_COUNT)
+
+    def add(self, value):
+        index = value >> _REST_BITS
+        rest = value & ((1 << _REST_BITS) - 1)
+        rank = _REST_BITS - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        total = sum(2.0 ** -register for register in self.registers)
+        estimate = _ALPHA * REGISTER_COUNT * REGISTER_COUNT / total
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTER_COUNT and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = REGISTER_COUNT * log(REGISTER_COUNT / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        # Registers are mostly zero for all but the busiest items
+        return zlib.compress(bytes(self.registers), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(zlib.decompress(bytes(data)))
+
+
+def get_visitor_hash(request):
+    """Keyed 64-bit hash of IP and user agent; nothing reversible is stored"""
+    visitor = '%s|%s' % (request.META.get('REMOTE_ADDR', ''), request.META.get('HTTP_USER_AGENT', '')[:512])
+    return int.from_bytes(salted_hmac('core.visitors', visitor).digest()[:8], 'big')
+
+
+# --- In-memory sketches ---
+
+_sketch_lock = threading.Lock()
+_pending = {}
+_last_flush = time.monotonic()
+
+
+def record_visit(request, item_type, item_ids):
+    """Add the request's visitor to today's sketch of each item"""
+    if not item_ids:
+        return
+    visitor = get_visitor_hash(request)
+    today = timezone.localdate()
+    with _sketch_lock:
+        for item_id in item_ids:
+            key = (today, item_type, item_id)
+            sketch = _pending.get(key)
+            if sketch is None:
+                sketch = _pending[key] = HyperLogLog()
+            sketch.add(visitor)
+
+
+def flush_visitor_sketches_if_due(**kwargs):
+    """request_finished handler: flush once VISITOR_SKETCH_FLUSH_SECONDS have passed"""
+    global _last_flush
+    with _sketch_lock:
+        if not _pending or time.monotonic() - _last_flush < settings.VISITOR_SKETCH_FLUSH_SECONDS:
+            return
+        _last_flush = time.monotonic()
+    flush_visitor_sketches()
+
+
+def flush_visitor_sketches():
+    """Merge the in-memory sketches into the stored ones; returns how many were written"""
+    global _pending
+    with _sketch_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return 0
+
+    groups = {}
+    for (date, item_type, item_id), sketch in pending.items():
+        groups.setdefault((date, item_type), {})[item_id] = sketch
+    with transaction.atomic():
+        for (date, item_type), sketches in groups.items():
+            stored = UniqueVisitorSketch.objects.select_for_update().filter(
+                date=date, item_type=item_type, item_id__in=sketches,
+            )
+            updated = []
+            for row in stored:
+                sketch = sketches.pop(row.item_id).merge(HyperLogLog.from_bytes(row.registers))
+                row.registers = sketch.to_bytes()
+                updated.append(row)
+            UniqueVisitorSketch.objects.bulk_update(updated, ['registers'])
+            for item_id, sketch in sketches.items():
+                # Another worker may insert the same row meanwhile
+                row, created = UniqueVisitorSketch.objects.get_or_create(
+                    date=date, item_type=item_type, item_id=item_id,
+                    defaults={'registers': sketch.to_bytes()},
+                )
+                if not created:
+                    row.registers = sketch.merge(HyperLogLog.from_bytes(row.registers)).to_bytes()
+                    row.save(update_fields=['registers'])
+    return len(pending)
+
+
+# --- Estimates ---
+
+def get_unique_visitors(item_type, item_ids, days=None):
+    """
+    Estimated distinct visitors per item over the last `days` days
+    (UNIQUE_VISITOR_WINDOW_DAYS by default), in one query: {item_id: count}.
+    """
+    days = days or settings.UNIQUE_VISITOR_WINDOW_DAYS
+    since = timezone.localdate() - timedelta(days=days - 1)
+    merged = {}
+    rows = UniqueVisitorSketch.objects.filter(
+        item_type=item_type, item_id__in=list(item_ids), date__gte=since,
+    ).values_list('item_id', 'registers')
+    for item_id, registers in rows:
+        sketch = HyperLogLog.from_bytes(registers)
+        if item_id in merged:
+            merged[item_id].merge(sketch)
+        else:
+            merged[item_id] = sketch
+    return {item_id: merged[item_id].estimate() if item_id in merged else 0 for item_id in item_ids}
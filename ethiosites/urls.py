@@ -16,16 +16,19 @@ Including another URLconf
 """
 # ethiosites/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.media import serve_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('ckeditor/', include('django_ckeditor_5.urls')),
+    path('api/v1/', include('core.api_urls')),
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
     path('', include('core.urls')),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
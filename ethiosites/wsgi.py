@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ethiosites.settings')
 
 application = get_wsgi_application()
+
+# Only server processes import this module, so management commands skip the warm-up
+from core.template_preload import preload_templates_on_startup  # noqa: E402
+
+preload_templates_on_startup()
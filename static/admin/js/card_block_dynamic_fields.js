@@ -113,22 +113,16 @@
         });
     }
     
-    function initializeDynamicFields() {
-        // Try to get sections data from a script tag
-        const sectionsScript = $('#sections-data-script');
-        if (sectionsScript.length) {
-            try {
-                const sectionsData = JSON.parse(sectionsScript.text());
-                sectionsData.forEach(function(section) {
-                    sectionsCache[section.id] = section.section_type;
-                    // Add data attribute to option
-                    $('#id_section option[value="' + section.id + '"]').attr('data-section-type', section.section_type);
-                });
-            } catch (e) {
-                console.warn('Could not parse sections data:', e);
-            }
-        }
-        
+    function applySectionsData(sectionsData) {
+        Object.keys(sectionsData).forEach(function(sectionId) {
+            const sectionType = sectionsData[sectionId];
+            sectionsCache[sectionId] = sectionType;
+            // Add data attribute to option
+            $('#id_section option[value="' + sectionId + '"]').attr('data-section-type', sectionType);
+        });
+    }
+    
+    function bindSectionChange() {
         const sectionType = getSectionType();
         updateFieldVisibility(sectionType);
         
@@ -139,6 +133,28 @@
         });
     }
     
+    function initializeDynamicFields() {
+        // The sections map lives at a versioned URL so the browser caches it until sections change
+        const sectionsScript = $('#sections-data-script');
+        const url = sectionsScript.data('url');
+        if (!url) {
+            bindSectionChange();
+            return;
+        }
+        fetch(url, { credentials: 'same-origin' })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(applySectionsData)
+            .catch(function(e) {
+                console.warn('Could not load sections data:', e);
+            })
+            .then(bindSectionChange);
+    }
+    
     $(document).ready(function() {
         // Wait for Django admin to fully initialize
         setTimeout(initializeDynamicFields, 200);
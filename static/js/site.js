@@ -0,0 +1,234 @@
+// Site behaviour shared by all public pages; loaded with defer from base.html
+// Mobile Menu Functions
+function openMobileMenu() {
+    document.getElementById('mobileMenuOverlay').classList.remove('hidden');
+    document.getElementById('mobileMenuDrawer').classList.remove('translate-x-full');
+    setTimeout(() => lucide.createIcons(), 350);
+}
+
+function closeMobileMenu() {
+    document.getElementById('mobileMenuOverlay').classList.add('hidden');
+    document.getElementById('mobileMenuDrawer').classList.add('translate-x-full');
+}
+
+function toggleMobileDropdown(btn) {
+    const dropdown = btn.nextElementSibling;
+    const chevron = btn.querySelector('i[data-lucide="chevron-down"]');
+    dropdown.classList.toggle('hidden');
+    chevron.classList.toggle('rotate-180');
+}
+
+// Desktop Dropdown Functions
+function toggleDesktopDropdown(element) {
+    const dropdown = element.querySelector('.nav-dropdown-content');
+    const chevron = element.querySelector('i[data-lucide="chevron-down"]');
+    dropdown.classList.toggle('hidden');
+    chevron.classList.toggle('rotate-180');
+}
+
+// Close desktop dropdowns when clicking outside
+document.addEventListener('click', (e) => {
+    // Close all desktop dropdowns
+    document.querySelectorAll('.nav-dropdown').forEach(dropdown => {
+        if (!dropdown.contains(e.target)) {
+            const content = dropdown.querySelector('.nav-dropdown-content');
+            const chevron = dropdown.querySelector('i[data-lucide="chevron-down"]');
+            if (content && !content.classList.contains('hidden')) {
+                content.classList.add('hidden');
+                if (chevron) {
+                    chevron.classList.remove('rotate-180');
+                }
+            }
+        }
+    });
+    
+    // Language dropdown handling
+    const languageDropdown = document.getElementById('languageDropdown');
+    const languageSwitcher = document.querySelector('.relative.group');
+    if (languageDropdown && !languageSwitcher.contains(e.target)) {
+        languageDropdown.classList.add('hidden');
+        document.getElementById('languageChevron').classList.remove('rotate-180');
+    }
+});
+
+// Language Switching Functions
+function toggleLanguageDropdown() {
+    const dropdown = document.getElementById('languageDropdown');
+    const chevron = document.getElementById('languageChevron');
+    dropdown.classList.toggle('hidden');
+    chevron.classList.toggle('rotate-180');
+}
+
+function changeLanguage(lang) {
+    // Get current URL
+    const url = new URL(window.location);
+    // Set the language parameter
+    url.searchParams.set('lang', lang);
+    // Reload the page with the new language
+    window.location.href = url.toString();
+}
+
+// Close menu on Escape key
+document.addEventListener('keydown', (e) => {
+    if (e.key === 'Escape') closeMobileMenu();
+});
+
+// Initialize Lucide icons
+document.addEventListener("DOMContentLoaded", () => {
+    lucide.createIcons();
+});
+
+// Track Navigation Click
+function trackNavigationClick(navId) {
+    // In a real implementation, you would send an AJAX request to track the click
+    // For now, we'll just increment the counter on the server side
+    console.log('Navigation item clicked for ID: ' + navId);
+}
+
+// Track Card CTA Click
+function trackCardClick(cardId, event) {
+    event.preventDefault();
+    const link = event.target.closest('a');
+    const url = link ? link.href : '#';
+    
+    // Send AJAX request to track the click
+    fetch(`/track/card-click/${cardId}/`, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'X-Requested-With': 'XMLHttpRequest',
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({})
+    }).then(response => {
+        if (response.ok) {
+            // Redirect to the original URL after tracking
+            if (url !== '#') {
+                window.location.href = url;
+            }
+        }
+    }).catch(error => {
+        console.error('Error tracking click:', error);
+        // Redirect anyway if tracking fails
+        if (url !== '#') {
+            window.location.href = url;
+        }
+    });
+}
+
+// Track Hero CTA Click
+function trackHeroCtaClick(heroId, event) {
+    event.preventDefault();
+    const link = event.target.closest('a');
+    const url = link ? link.href : '#';
+    
+    // Send AJAX request to track the click
+    fetch(`/track/hero-cta-click/${heroId}/`, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'X-Requested-With': 'XMLHttpRequest',
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({})
+    }).then(response => {
+        if (response.ok) {
+            // Redirect to the original URL after tracking
+            if (url !== '#') {
+                window.location.href = url;
+            }
+        }
+    }).catch(error => {
+        console.error('Error tracking click:', error);
+        // Redirect anyway if tracking fails
+        if (url !== '#') {
+            window.location.href = url;
+        }
+    });
+}
+
+// Track Section CTA Click
+function trackSectionCTAClick(sectionId, event) {
+    event.preventDefault();
+    const link = event.target.closest('a');
+    const url = link ? link.href : '#';
+
+    // Send AJAX request to track the click
+    fetch(`/track/section-cta-click/${sectionId}/`, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken'),
+            'X-Requested-With': 'XMLHttpRequest',
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({})
+    }).then(response => {
+        if (response.ok) {
+            // Redirect to the original URL after tracking
+            if (url !== '#') {
+                window.location.href = url;
+            }
+        }
+    }).catch(error => {
+        console.error('Error tracking click:', error);
+        // Redirect anyway if tracking fails
+        if (url !== '#') {
+            window.location.href = url;
+        }
+    });
+}
+
+// Contact Form: submitted in the background, the message is emailed by the server later
+function submitContactForm(event) {
+    event.preventDefault();
+    const form = event.target;
+    const button = form.querySelector('button[type="submit"]');
+    const status = form.querySelector('.contact-form-status');
+    const showStatus = (text, ok) => {
+        status.textContent = text;
+        status.classList.remove('hidden', 'text-green-400', 'text-red-400');
+        status.classList.add(ok ? 'text-green-400' : 'text-red-400');
+    };
+
+    button.disabled = true;
+    fetch(form.action, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {'X-Requested-With': 'XMLHttpRequest'},
+        body: new FormData(form)
+    }).then(response => response.json().then(data => ({response, data}))).then(({response, data}) => {
+        if (response.ok) {
+            form.reset();
+            showStatus('Thank you! Your message has been sent.', true);
+        } else if (data.errors) {
+            const messages = Object.values(data.errors).flat().map(error => error.message);
+            showStatus(messages.join(' '), false);
+        } else {
+            showStatus(data.error || 'Your message could not be sent.', false);
+        }
+    }).catch(error => {
+        console.error('Error sending contact form:', error);
+        showStatus('Your message could not be sent. Please try again.', false);
+    }).finally(() => {
+        button.disabled = false;
+    });
+}
+
+// Helper function to get CSRF token
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}